@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Module to measure construction time and memory of large theories
+
+Rules are generated over independent contexts, so the number of rules
+and comparisons grows with the number of contexts. Rules (parse, split
+and consistency) and comparisons are timed separately, comparisons
+are generated only when they are used
+"""
+
+import gc
+from sys import getsizeof
+from timeit import default_timer
+from cp_theory import CPTheory
+
+
+def theory_string(num_contexts, num_attributes):
+    """
+    Return a theory with 'num_contexts' contexts (values of attribute
+    'ctx') and a rule over each attribute of 'num_attributes' to each
+    context
+    """
+    rule_list = []
+    for context in range(num_contexts):
+        for att in range(num_attributes):
+            rule_list.append(
+                'IF ctx = {c} THEN a{a} = 1 > a{a} = 2'.format(c=context,
+                                                               a=att))
+    return ' AND '.join(rule_list)
+
+
+def object_size(obj):
+    """
+    Return size of 'obj' and of its attribute dict (if it has one)
+    """
+    size = getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += getsizeof(obj.__dict__)
+    return size
+
+
+def theory_size(cpt):
+    """
+    Return size of rules and comparisons objects of 'cpt'
+    (contents of their containers are not counted)
+    """
+    size = object_size(cpt)
+    for cpr in cpt.rules_list:
+        size += object_size(cpr)
+    for comp in cpt.comparisons_list:
+        size += object_size(comp)
+    return size
+
+
+def benchmark(num_contexts, num_attributes, repeat=3):
+    """
+    Return number of rules, number of comparisons, best construction
+    time of rules, best generation time of comparisons (seconds) and
+    size of objects (bytes) of a generated theory
+    """
+    string = theory_string(num_contexts, num_attributes)
+    best_rules_time = None
+    best_comp_time = None
+    for _ in range(repeat):
+        gc.collect()
+        start = default_timer()
+        cpt = CPTheory(string)
+        rules_time = default_timer() - start
+        start = default_timer()
+        len(cpt.comparisons_list)
+        comp_time = default_timer() - start
+        if best_rules_time is None or rules_time < best_rules_time:
+            best_rules_time = rules_time
+        if best_comp_time is None or comp_time < best_comp_time:
+            best_comp_time = comp_time
+    return (len(cpt.rules_list), len(cpt.comparisons_list), best_rules_time,
+            best_comp_time, theory_size(cpt))
+
+
+############################################################################
+# If the file is executed as a program
+if __name__ == '__main__':
+    print 'contexts attributes rules comparisons rules_time(s) ' \
+        'comparisons_time(s) size(bytes)'
+    for CONTEXTS, ATTRIBUTES in ((25, 1), (50, 1), (100, 1),
+                                 (20, 2), (40, 2)):
+        RESULT = benchmark(CONTEXTS, ATTRIBUTES)
+        print '{c} {a} {r} {n} {t:.3f} {u:.3f} {s}'.format(
+            c=CONTEXTS, a=ATTRIBUTES, r=RESULT[0], n=RESULT[1],
+            t=RESULT[2], u=RESULT[3], s=RESULT[4])
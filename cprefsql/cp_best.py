@@ -3,15 +3,27 @@
 Module to compute the best tuples according to preferences
 """
 
-from cp_theory import CPTheory
+import cPickle
+from tempfile import TemporaryFile
+from cp_theory import get_theory
+from cp_order import CPOrder
 
 
 def most_preferred(preference_rules, tuples_list):
     """Return dominant tuples from 'tuples_list'
     according to 'preference_rules'"""
+    return list(iter_most_preferred(preference_rules, tuples_list))
+
+
+def iter_most_preferred(preference_rules, tuples_list):
+    """Generate dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    A tuple is generated as soon as it was compared against all tuples
+    after it (tuples before it can not discard it anymore)"""
 
     # Create a cp-theory to compare tuples
-    cpt = CPTheory(preference_rules)
+    cpt = get_theory(preference_rules)
     # Suppose all tuples will be returned
     # When a position is 'False' the respective tuple is dominated
     # and not will be returned
@@ -34,11 +46,131 @@ def most_preferred(preference_rules, tuples_list):
                     # Check if 'tup_processed' dominates 'tup_compared'
                     elif cpt.datalog_dominates(tup_processed, tup_compared):
                         return_list[idx_compared] = False
-    # Build result list
+            # Check it tuple has to be returned
+            if return_list[idx_processed]:
+                yield tup_processed
+
+
+def most_preferred_sorted(preference_rules, tuples_list):
+    """Return dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Tuples are sorted by a key compatible with preferences (see CPOrder),
+    so a tuple can be dominated only by tuples before it and
+    each tuple is tested only against dominant tuples already found"""
+    return list(iter_most_preferred_sorted(preference_rules, tuples_list))
+
+
+def iter_most_preferred_sorted(preference_rules, tuples_list):
+    """Generate dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Same as most_preferred_sorted, but a tuple is generated as soon as
+    it is not dominated by tuples before it"""
+    cpt = get_theory(preference_rules)
+    try:
+        order = CPOrder(cpt)
+        sorted_list = sorted(tuples_list, key=order.key)
+    except ValueError:
+        # Preferences over some context are not acyclic
+        for tup in iter_most_preferred(cpt, tuples_list):
+            yield tup
+        return
     result_list = []
-    for idx, returned in enumerate(return_list):
-        # Check it tuple has to be returned
-        if returned:
-            result_list.append(tuples_list[idx])
-    del cpt
-    return result_list
+    for tup in sorted_list:
+        for tup_result in result_list:
+            if cpt.datalog_dominates(tup_result, tup):
+                break
+        else:
+            # 'tup' is not dominated by any tuple before it
+            result_list.append(tup)
+            yield tup
+
+
+def overflow_tuples(overflow_file):
+    """Generate tuples stored in temporary file 'overflow_file'"""
+    overflow_file.seek(0)
+    while True:
+        try:
+            yield cPickle.load(overflow_file)
+        except EOFError:
+            break
+
+
+def most_preferred_stream(preference_rules, tuples_iter, window_size=None):
+    """Return dominant tuples from iterable 'tuples_iter'
+    according to 'preference_rules'
+
+    Block nested loop method: the window of current dominant tuples
+    has at most 'window_size' tuples (unbounded when it is None).
+    When window is full, new dominant tuples are written in a temporary
+    file and they are processed again in another pass"""
+    return list(iter_most_preferred_stream(preference_rules, tuples_iter,
+                                           window_size))
+
+
+def iter_most_preferred_stream(preference_rules, tuples_iter,
+                               window_size=None):
+    """Generate dominant tuples from iterable 'tuples_iter'
+    according to 'preference_rules'
+
+    Same as most_preferred_stream, but a window tuple is generated as
+    soon as it was compared against all tuples"""
+    cpt = get_theory(preference_rules)
+    # Window of dominant tuples, each element is [tuple, pass, timestamp]
+    # Timestamp is the number of tuples written in temporary file of the
+    # pass before tuple has entered window
+    window_list = []
+    # Pass number
+    num_pass = 0
+    input_iter = tuples_iter
+    input_file = None
+    while True:
+        overflow_file = None
+        num_written = 0
+        num_read = 0
+        for tup in input_iter:
+            # Tuples of previous pass are compared against all tuples
+            # when 'num_read' reaches their timestamp
+            for element in window_list:
+                if element[1] < num_pass and element[2] <= num_read:
+                    yield element[0]
+            window_list = [element for element in window_list
+                           if element[1] == num_pass
+                           or element[2] > num_read]
+            num_read += 1
+            dominated = False
+            new_window_list = []
+            for element in window_list:
+                # Check if 'tup' is dominated by some tuple in window
+                if not dominated and cpt.datalog_dominates(element[0], tup):
+                    dominated = True
+                # Window tuples dominated by 'tup' are removed
+                if dominated or not cpt.datalog_dominates(tup, element[0]):
+                    new_window_list.append(element)
+            window_list = new_window_list
+            if dominated:
+                continue
+            if window_size is None or len(window_list) < window_size:
+                window_list.append([tup, num_pass, num_written])
+            else:
+                # Window is full, 'tup' will be processed in next pass
+                if overflow_file is None:
+                    overflow_file = TemporaryFile()
+                cPickle.dump(tup, overflow_file, cPickle.HIGHEST_PROTOCOL)
+                num_written += 1
+        # Tuples that entered window before first written tuple were
+        # compared against all remaining tuples (as previous pass tuples)
+        for element in window_list:
+            if element[1] < num_pass or element[2] == 0:
+                yield element[0]
+        window_list = [element for element in window_list
+                       if element[1] == num_pass and element[2] > 0]
+        if input_file is not None:
+            input_file.close()
+        if overflow_file is None:
+            break
+        # Next pass reads tuples from temporary file
+        input_file = overflow_file
+        input_iter = overflow_tuples(input_file)
+        num_pass += 1
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Module to compute the best tuples according to preferences
+Algorithms optimized using classes of intervals
+"""
+
+from cp_theory import get_theory
+from cp_best import most_preferred
+from cp_class import CPClassifier, class_dominators
+
+
+def most_preferred_class(preference_rules, tuples_list):
+    """Return dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Dominance is computed for pairs of classes instead of pairs of tuples"""
+    cpt = get_theory(preference_rules)
+    classifier = CPClassifier(cpt)
+    try:
+        class_list = classifier.partition(tuples_list)
+    except TypeError:
+        # Some value can not be used as key
+        return most_preferred(cpt, tuples_list)
+    # Dominated tuples
+    dominated_set = set()
+    for class_tup2, index_list2 in class_list:
+        for class_tup1, index_list1 in class_list:
+            requirement_list = classifier.dominance(class_tup1, class_tup2)
+            if requirement_list == []:
+                continue
+            # All tuples of different class are dominated
+            if frozenset() in requirement_list \
+            and class_tup1 is not class_tup2:
+                dominated_set.update(index_list2)
+                break
+            dominated_set.update(class_dominators(tuples_list, index_list1,
+                                                  index_list2,
+                                                  requirement_list))
+    return [tup for index, tup in enumerate(tuples_list)
+            if index not in dominated_set]
@@ -4,7 +4,10 @@ Module to compute the best tuples according to preferences
 Algorithms optimized using preference partition method
 """
 
-from cp_theory import CPTheory
+from cp_theory import get_theory
+from cp_best import iter_most_preferred
+from cp_codegen import bind_tuple
+from cp_columnar import use_columnar, most_preferred_columnar
 
 
 def get_tuple_id(tup, attributes_set):
@@ -36,17 +39,22 @@ def build_partitions(tuples_list, attributes_set):
     return partitions
 
 
-def best_direct(tuples_list, comparison):
+def best_direct(tuples_list, predicate):
     """Get dominant tuples of partition 'tuples_list'
-    according to 'comparison'"""
+    according to compiled comparison 'predicate'
+
+    'predicate' has tests 'preferred' and 'not_preferred'
+    (see CPComparison.compile and cp_codegen.BoundComparison)"""
     preferred_list = []
     incomparable_list = []
+    preferred = predicate.preferred
+    not_preferred = predicate.not_preferred
     for tup in tuples_list:
         # Check if tuple is preferred
-        if comparison.preferred(tup):
+        if preferred(tup):
             preferred_list.append(tup)
         # Check if tuple is incomparable
-        elif not comparison.not_preferred(tup):
+        elif not not_preferred(tup):
             incomparable_list.append(tup)
     # Check if there no exists preferred tuples
     if preferred_list == []:
@@ -56,30 +64,73 @@ def best_direct(tuples_list, comparison):
         return preferred_list + incomparable_list
 
 
-def best_partition(tuples_list, comparisom):
+def key_partitions(tuples_list, bound_comparison):
+    """Build a partition set over 'tuples_list' based on partition key
+    of 'bound_comparison' (see cp_codegen.BoundComparison)"""
+    partitions = {}
+    partition_key = bound_comparison.partition_key
+    for tup in tuples_list:
+        partitions.setdefault(partition_key(tup), []).append(tup)
+    return partitions
+
+
+def best_partition(tuples_list, bound_comparison):
     """Get dominant tuples from 'tuples_list'
-    according to 'comparison'"""
+    according to 'bound_comparison' (see cp_codegen.BoundComparison)"""
     result_list = []
-    # Tuple attributes
-    tuples_att_set = set(tuples_list[0].keys())
-    # Attributes of tuples not present in 'comparison'
-    att_set = tuples_att_set.difference(comparisom.preference_att_set())
-    partitions = build_partitions(tuples_list, att_set)
+    partitions = key_partitions(tuples_list, bound_comparison)
     # Get dominant tuples in each partition according to 'comparison'
     for tup_id in partitions:
-        result_list += best_direct(partitions[tup_id], comparisom)
+        result_list += best_direct(partitions[tup_id], bound_comparison)
     return result_list
 
 
 def most_preferred_partition(preference_rules, tuples_list):
     """Return dominant tuples from 'tuples_list'
     according to 'preference_rules'"""
+    return list(iter_most_preferred_partition(preference_rules, tuples_list))
+
+
+def iter_most_preferred_partition(preference_rules, tuples_list):
+    """Generate dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Tuples of last comparison are generated partition by partition.
+    Large inputs are evaluated over columnar arrays when NumPy is available
+    (see cp_columnar). Datalog-only theories (comparisons exceeded
+    compilation budget) use datalog method"""
     # Create a cp-theory to compare tuples
-    cpt = CPTheory(preference_rules)
+    cpt = get_theory(preference_rules)
     best_list = tuples_list
-    if len(best_list):
-        # Get dominant tuples from 'best_list' according to each comparison
-        for comp in cpt.comparisons_list:
-            best_list = best_partition(best_list, comp)
-    del cpt
-    return best_list
+    if len(best_list) == 0:
+        return
+    # Only comparisons over attributes of tuples are generated
+    if len(cpt.comparisons_over(best_list[0].keys())) == 0:
+        if cpt.datalog_only:
+            for tup in iter_most_preferred(cpt, best_list):
+                yield tup
+            return
+        for tup in best_list:
+            yield tup
+        return
+    if use_columnar(best_list):
+        try:
+            best_list = most_preferred_columnar(cpt, best_list)
+        except TypeError:
+            # Some value can not be encoded, use tuples directly
+            pass
+        else:
+            for tup in best_list:
+                yield tup
+            return
+    # Comparisons bound to attributes of tuples
+    bound = bind_tuple(cpt, best_list[0])
+    # Get dominant tuples from 'best_list' according to each comparison
+    for bound_comp in bound.comparisons_list[:-1]:
+        best_list = best_partition(best_list, bound_comp)
+    # Generate dominant tuples of each partition of last comparison
+    bound_comp = bound.comparisons_list[-1]
+    partitions = key_partitions(best_list, bound_comp)
+    for tup_id in partitions:
+        for tup in best_direct(partitions[tup_id], bound_comp):
+            yield tup
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Module to bound generation of comparisons of theories
+
+Formulas combine intervals of all attributes, so their number grows with
+the product of the number of intervals of each attribute. A budget
+limits formulas, comparisons and time of a generation and counts its
+progress. When a limit is exceeded, generation stops with BudgetExceeded
+"""
+
+from timeit import default_timer
+
+# Default limits of a generation (None is unbounded)
+MAX_FORMULAS = 100000
+MAX_COMPARISONS = 100000
+# Seconds
+MAX_COMPILE_TIME = 60.0
+# When True, theories fall back to datalog-only mode instead of failing
+BUDGET_FALLBACK = True
+# Number of steps between time checks
+TIME_CHECK_STEPS = 100
+# Number of attributes reported when a limit is exceeded
+REPORT_ATTRIBUTES = 5
+
+
+class BudgetExceeded(ValueError):
+    """
+    Error raised when a generation exceeds a limit of its budget
+
+    Attributes:
+        att_list (list): Attributes with most intervals in generation
+            (they cause the growth of formulas)
+    """
+
+    def __init__(self, message, att_list):
+        ValueError.__init__(self, message)
+        self.att_list = att_list
+
+
+class CompileBudget(object):
+    """
+    Limits and progress counters of a generation of comparisons
+
+    Attributes:
+        max_formulas (int): Maximum number of formulas
+        max_comparisons (int): Maximum number of comparisons
+            (before removal of not essential comparisons)
+        max_time (float): Maximum time of generation (seconds)
+        fallback (boolean): Flag to fall back to datalog-only mode instead
+            of raising BudgetExceeded (see CPTheory.datalog_only)
+        formulas (int): Formulas generated by last generation
+        comparisons (int): Comparisons generated by last generation
+        steps (int): Steps (tested formulas and comparisons) of last
+            generation
+    """
+
+    __slots__ = ('max_formulas', 'max_comparisons', 'max_time', 'fallback',
+                 'formulas', 'comparisons', 'steps', '__start_time',
+                 '__interval_dict')
+
+    def __init__(self, max_formulas=MAX_FORMULAS,
+                 max_comparisons=MAX_COMPARISONS, max_time=MAX_COMPILE_TIME,
+                 fallback=BUDGET_FALLBACK):
+        self.max_formulas = max_formulas
+        self.max_comparisons = max_comparisons
+        self.max_time = max_time
+        self.fallback = fallback
+        self.formulas = 0
+        self.comparisons = 0
+        self.steps = 0
+        self.__start_time = default_timer()
+        self.__interval_dict = {}
+
+    def start(self, interval_dict):
+        """
+        Start a generation (counters are reset)
+
+        'interval_dict' has the number of intervals of each attribute
+        of generation (used to report attributes)
+        """
+        self.formulas = 0
+        self.comparisons = 0
+        self.steps = 0
+        self.__start_time = default_timer()
+        self.__interval_dict = interval_dict
+
+    def elapsed(self):
+        """
+        Return time of current generation (seconds)
+        """
+        return default_timer() - self.__start_time
+
+    def progress(self):
+        """
+        Return a string with counters of current generation
+        """
+        return '{f} formulas, {c} comparisons, {t:.1f}s'.format(
+            f=self.formulas, c=self.comparisons, t=self.elapsed())
+
+    def add_formula(self):
+        """
+        Count a new formula
+        """
+        self.formulas += 1
+        if self.max_formulas is not None \
+        and self.formulas > self.max_formulas:
+            self.__exceeded('{n} formulas'.format(n=self.max_formulas))
+
+    def add_comparison(self):
+        """
+        Count a new comparison
+        """
+        self.comparisons += 1
+        if self.max_comparisons is not None \
+        and self.comparisons > self.max_comparisons:
+            self.__exceeded('{n} comparisons'.format(
+                n=self.max_comparisons))
+
+    def step(self, weight=1):
+        """
+        Count 'weight' steps of generation
+
+        Time is checked every TIME_CHECK_STEPS steps
+        """
+        old_steps = self.steps
+        self.steps += weight
+        if self.max_time is not None \
+        and self.steps // TIME_CHECK_STEPS != old_steps // TIME_CHECK_STEPS \
+        and self.elapsed() > self.max_time:
+            self.__exceeded('{t}s'.format(t=self.max_time))
+
+    def iter_steps(self, item_list):
+        """
+        Generate items of 'item_list' counting a step for each item
+
+        Steps are counted in blocks of TIME_CHECK_STEPS items, so items
+        are not counted one by one
+        """
+        for start in xrange(0, len(item_list), TIME_CHECK_STEPS):
+            block_list = item_list[start:start + TIME_CHECK_STEPS]
+            self.step(len(block_list))
+            for item in block_list:
+                yield item
+
+    def __exceeded(self, limit_str):
+        """
+        Raise BudgetExceeded reporting attributes with most intervals
+        """
+        att_list = sorted(self.__interval_dict,
+                          key=lambda att: (-self.__interval_dict[att], att))
+        att_list = att_list[:REPORT_ATTRIBUTES]
+        att_str = ', '.join('{a} ({n})'.format(
+            a=att, n=self.__interval_dict[att]) for att in att_list)
+        raise BudgetExceeded(
+            'Compilation budget of {l} exceeded ({p}) over {n} attributes, '
+            'attributes with most intervals: {a}'.format(
+                l=limit_str, p=self.progress(),
+                n=len(self.__interval_dict), a=att_str),
+            att_list)
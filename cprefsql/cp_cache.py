@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Module with bounded caches used by preference algorithms
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Dictionary like cache with bounded size and LRU eviction
+
+    When the cache is full, the least recently used entry is removed
+
+    Attributes:
+        capacity (int): Maximum number of entries
+        hits (int): Number of successful lookups
+        misses (int): Number of failed lookups
+    """
+
+    def __init__(self, capacity):
+        """
+        Create an empty cache with at most 'capacity' entries
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """
+        Return value stored to 'key' (or 'default' if there is no entry)
+
+        The entry becomes the most recently used
+        """
+        if key in self.__entries:
+            value = self.__entries.pop(key)
+            self.__entries[key] = value
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Store 'value' to 'key' removing least recently used entries
+        if the cache is full
+        """
+        if key in self.__entries:
+            del self.__entries[key]
+        self.__entries[key] = value
+        while len(self.__entries) > self.capacity:
+            self.__entries.popitem(last=False)
+
+    def remove(self, key):
+        """
+        Remove entry of 'key' (if it exists)
+        """
+        if key in self.__entries:
+            del self.__entries[key]
+
+    def clear(self):
+        """
+        Remove all entries and reset counters
+        """
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class DominanceCache(object):
+    """
+    Cache of dominance tests between pairs of tuples
+
+    Dominance depends only on values of attributes in rules and on
+    equality of remaining attributes. So, the key of a pair of tuples is
+    formed by attribute names, values of 'att_set' attributes of both
+    tuples and a signature of equality of remaining attributes.
+
+    Attributes:
+        att_set (frozenset): Attributes used by rules
+    """
+
+    def __init__(self, att_set, capacity):
+        """
+        Create an empty cache to theory with rule attributes 'att_set'
+        """
+        self.att_set = frozenset(att_set)
+        self.__cache = LRUCache(capacity)
+
+    def __len__(self):
+        return len(self.__cache)
+
+    @property
+    def capacity(self):
+        """
+        Maximum number of stored dominance tests
+        """
+        return self.__cache.capacity
+
+    @property
+    def hits(self):
+        """
+        Number of dominance tests found in cache
+        """
+        return self.__cache.hits
+
+    @property
+    def misses(self):
+        """
+        Number of dominance tests not found in cache
+        """
+        return self.__cache.misses
+
+    def key(self, method, tuple1, tuple2):
+        """
+        Return key of dominance test of 'method' over 'tuple1' and 'tuple2'
+
+        If some value can not be hashed, None is returned
+        """
+        att_list1 = sorted(tuple1)
+        att_list2 = sorted(tuple2)
+        values1 = tuple(tuple1[att] for att in att_list1
+                        if att in self.att_set)
+        values2 = tuple(tuple2[att] for att in att_list2
+                        if att in self.att_set)
+        equality = tuple(att in tuple2 and tuple1[att] == tuple2[att]
+                         for att in att_list1 if att not in self.att_set)
+        key = (method, tuple(att_list1), tuple(att_list2),
+               values1, values2, equality)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def dominates(self, method, function, tuple1, tuple2):
+        """
+        Return result of dominance test 'function' over 'tuple1' and
+        'tuple2' (result is stored to 'method')
+        """
+        key = self.key(method, tuple1, tuple2)
+        if key is None:
+            return function(tuple1, tuple2)
+        result = self.__cache.get(key)
+        if result is None:
+            result = function(tuple1, tuple2)
+            self.__cache.put(key, result)
+        return result
+
+    def clear(self):
+        """
+        Remove all stored tests and reset counters
+        """
+        self.__cache.clear()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Module to compute dominance over classes of tuples
+
+After rules split, intervals of each attribute are disjoint.
+A class of tuples is represented by a class tuple, where attributes of
+rules have the interval of the original value and remaining attributes
+have the original value. Dominance is computed once for each pair of
+classes and then it is expanded to tuples.
+"""
+
+from cp_interval import value_in_interval, tuple_has_interval
+from cp_best_partition import get_tuple_id
+
+
+class CPClassifier(object):
+    """
+    Class to map tuples to classes according to a theory
+
+    Dominance between classes is a list of requirements. A requirement is
+    a set of attributes of rules that were not changed by rules and must
+    have equal values in both tuples. Tuple 'tuple1' of a class dominates
+    'tuple2' of another class if 'tuple1' is not equal to 'tuple2' and
+    they have equal values for all attributes of some requirement.
+
+    Attributes:
+        cpt (CPTheory): Theory used to compare classes
+    """
+
+    def __init__(self, cpt):
+        """
+        Create a CPClassifier from a CPTheory 'cpt'
+        """
+        self.cpt = cpt
+        # Intervals of each rule attribute
+        self.__interval_dict = {}
+        for cpr in cpt.rules_list:
+            att_interval_list = cpr.antecedents_dict.items()
+            att_interval_list.append((cpr.attribute, cpr.preferred))
+            att_interval_list.append((cpr.attribute, cpr.not_preferred))
+            for att, interval in att_interval_list:
+                interval_list = self.__interval_dict.setdefault(att, [])
+                if interval not in interval_list:
+                    interval_list.append(interval)
+        # Dominance of pairs of classes
+        self.__dominance_dict = {}
+
+    def class_value(self, att, value):
+        """
+        Return class value of 'value' of 'att'
+
+        Class value is the interval of 'att' with 'value' or
+        the own 'value' when there is no a single interval with it
+        """
+        if att not in self.__interval_dict:
+            return value
+        found_list = [interval for interval in self.__interval_dict[att]
+                      if value_in_interval(value, interval)]
+        if len(found_list) == 1:
+            return found_list[0]
+        return value
+
+    def class_tuple(self, tup):
+        """
+        Return class tuple of 'tup'
+        """
+        return {att: self.class_value(att, tup[att]) for att in tup}
+
+    def partition(self, tuples_list):
+        """
+        Return a list of classes of 'tuples_list'
+
+        Each class is a pair of class tuple and indexes of its tuples,
+        classes are in order of first tuple
+        """
+        class_list = []
+        class_dict = {}
+        for index, tup in enumerate(tuples_list):
+            class_tup = self.class_tuple(tup)
+            key = class_key(class_tup)
+            if key not in class_dict:
+                class_dict[key] = len(class_list)
+                class_list.append((class_tup, []))
+            class_list[class_dict[key]][1].append(index)
+        return class_list
+
+    def dominance(self, class_tuple1, class_tuple2):
+        """
+        Return list of requirements where tuples of 'class_tuple1'
+        dominate tuples of 'class_tuple2'
+
+        Datalog method is applied to class tuples, keeping the set of
+        attributes with original values
+        """
+        key = (class_key(class_tuple1), class_key(class_tuple2))
+        if key in self.__dominance_dict:
+            return self.__dominance_dict[key]
+        requirement_list = []
+        # Attributes of rules with original values
+        original_set = frozenset(att for att in class_tuple1
+                                 if att in self.__interval_dict
+                                 and type(class_tuple1[att]) is tuple)
+        process_list = [(class_tuple1, original_set)]
+        tested_set = set()
+        while process_list != [] and frozenset() not in requirement_list:
+            new_process_list = []
+            for tup, tup_original_set in process_list:
+                for rule, new_tup in self.cpt.datalog_successors(tup):
+                    new_original_set = tup_original_set.difference(
+                        rule.indifferent_att_set).difference(
+                            [rule.attribute])
+                    state = (class_key(new_tup), new_original_set)
+                    if state in tested_set:
+                        continue
+                    tested_set.add(state)
+                    new_process_list.append((new_tup, new_original_set))
+                    requirement = goal_requirement(new_tup, new_original_set,
+                                                   class_tuple2)
+                    if requirement is not None:
+                        add_requirement(requirement_list, requirement)
+            process_list = new_process_list
+        self.__dominance_dict[key] = requirement_list
+        return requirement_list
+
+
+def class_key(class_tup):
+    """
+    Return a hashable key for 'class_tup'
+    """
+    return tuple(sorted(class_tup.items()))
+
+
+def goal_requirement(datalog_tup, original_set, goal_tup):
+    """
+    Return requirement to 'datalog_tup' reach the class tuple 'goal_tup'
+    (None if it cannot be reached)
+    """
+    requirement = set()
+    for att in datalog_tup:
+        if att in original_set:
+            # Original value, tuples must have the same value
+            if att not in goal_tup or goal_tup[att] != datalog_tup[att]:
+                return None
+            requirement.add(att)
+        elif not tuple_has_interval(goal_tup, att, datalog_tup[att]):
+            return None
+    return frozenset(requirement)
+
+
+def add_requirement(requirement_list, requirement):
+    """
+    Add 'requirement' to 'requirement_list' keeping only minimal sets
+    """
+    for other in requirement_list:
+        if other.issubset(requirement):
+            return
+    requirement_list[:] = [other for other in requirement_list
+                           if not requirement.issubset(other)]
+    requirement_list.append(requirement)
+
+
+def class_dominators(tuples_list, index_list1, index_list2,
+                     requirement_list):
+    """
+    Return a dictionary where keys are indexes of 'index_list2' and values
+    are sets of indexes of 'index_list1' of tuples dominating them
+    according to 'requirement_list'
+    """
+    dominators_dict = {}
+    for requirement in requirement_list:
+        att_list = sorted(requirement)
+        # Group tuples of first class by values of requirement attributes
+        group_dict = {}
+        for index1 in index_list1:
+            tup_id = get_tuple_id(tuples_list[index1], att_list)
+            group_dict.setdefault(tup_id, []).append(index1)
+        for index2 in index_list2:
+            tup2 = tuples_list[index2]
+            tup_id = get_tuple_id(tup2, att_list)
+            for index1 in group_dict.get(tup_id, []):
+                if tuples_list[index1] != tup2:
+                    dominators_dict.setdefault(index2, set()).add(index1)
+    return dominators_dict
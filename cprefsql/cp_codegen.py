@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Module to generate comparison functions bound to a schema
+
+Inside a query all tuples have the same attributes, so attributes
+compared by equality in each comparison are known before comparing
+tuples. The functions of a theory are generated as Python source,
+compiled once and cached by theory and schema.
+
+When tuples are rows (see cp_rows), values are read by position.
+"""
+
+from cp_cache import LRUCache
+from cp_interval import IntervalPredicate, MINUS_INFINITY, PLUS_INFINITY
+from cp_rows import row_positions
+
+
+# Maximum number of schemas bound to each theory
+BOUND_CACHE_SIZE = 16
+
+
+class BoundComparison(object):
+    """
+    Comparison with functions generated to a schema
+
+    Attributes:
+        comparison (CPComparison): Original comparison
+        key_att_list (list): Attributes out of comparison formulas
+            (they define partitions of tuples)
+        equal_att_list (list): Attributes that must be equal in
+            dominance tests
+        preferred (function): Check if a tuple satisfies preferred values
+        not_preferred (function): Check if a tuple satisfies
+            not preferred values
+        dominates (function): Check if a tuple dominates another one
+            according to comparison
+        partition_key (function): Return the partition key of a tuple
+    """
+
+    def __init__(self, comparison, att_list, position_dict=None):
+        """
+        Generate functions of 'comparison' to tuples with
+        attributes 'att_list' (rows with 'position_dict', if it is given)
+        """
+        self.comparison = comparison
+        self.key_att_list = list(set(att_list).difference(
+            comparison.preference_att_set()))
+        self.equal_att_list = [att for att in att_list
+                               if att not in comparison.pref_formula_dict
+                               and att not in comparison.pref_indif_set
+                               and att not in comparison.not_pref_indif_set]
+        namespace = new_namespace(position_dict)
+        pref_source = formula_source('tuple1', comparison.pref_formula_dict,
+                                     att_list, namespace)
+        not_pref_source = formula_source('tuple1',
+                                         comparison.not_pref_formula_dict,
+                                         att_list, namespace)
+        dominates_source = dominance_source(comparison, self.equal_att_list,
+                                            att_list, namespace)
+        key_source = ', '.join(value_source('tuple1', att, namespace)
+                               for att in self.key_att_list)
+        self.preferred = compile_function(
+            'tuple1', pref_source, namespace)
+        self.not_preferred = compile_function(
+            'tuple1', not_pref_source, namespace)
+        self.dominates = compile_function(
+            'tuple1, tuple2', dominates_source, namespace)
+        if key_source != '':
+            key_source += ','
+        self.partition_key = compile_function(
+            'tuple1', '(' + key_source + ')', namespace)
+
+
+class BoundTheory(object):
+    """
+    Theory with comparison functions generated to a schema
+
+    Attributes:
+        cpt (CPTheory): Original theory
+        att_list (list): Attributes of tuples
+        comparisons_list (list): Bound comparisons (see BoundComparison),
+            only comparisons over attributes of tuples are bound
+        dominates (function): Check if a tuple dominates another one
+            according to theory (same as CPTheory.optimized_dominates)
+    """
+
+    def __init__(self, cpt, att_list, position_dict=None):
+        """
+        Generate functions of 'cpt' to tuples with attributes 'att_list'
+        (rows with 'position_dict', if it is given)
+        """
+        self.cpt = cpt
+        self.att_list = list(att_list)
+        self.comparisons_list = [BoundComparison(comp, self.att_list,
+                                                 position_dict)
+                                 for comp
+                                 in cpt.comparisons_over(self.att_list)]
+        namespace = new_namespace(position_dict)
+        # Tuples are tested against each comparison inline
+        source_list = [dominance_source(bound_comp.comparison,
+                                        bound_comp.equal_att_list,
+                                        self.att_list, namespace)
+                       for bound_comp in self.comparisons_list]
+        source = ' or '.join('(' + source + ')' for source in source_list)
+        if source == '':
+            source = 'False'
+        self.dominates = compile_function(
+            'tuple1, tuple2', 'tuple1 != tuple2 and (' + source + ')',
+            namespace)
+
+
+def bind_theory(cpt, att_list, position_dict=None):
+    """
+    Return the BoundTheory of 'cpt' to tuples with attributes 'att_list'
+
+    When 'position_dict' is given, tuples are rows with values in these
+    positions (see cp_rows). Bound theories are cached in 'cpt' by set of
+    attributes and positions
+    """
+    if cpt.bound_cache is None:
+        cpt.bound_cache = LRUCache(BOUND_CACHE_SIZE)
+    schema = frozenset(att_list)
+    if position_dict is None:
+        key = (schema, None)
+    else:
+        key = (schema, frozenset(position_dict.items()))
+    bound = cpt.bound_cache.get(key)
+    if bound is None:
+        bound = BoundTheory(cpt, sorted(schema), position_dict)
+        cpt.bound_cache.put(key, bound)
+    return bound
+
+
+def bind_tuple(cpt, tup):
+    """
+    Return the BoundTheory of 'cpt' to tuples like 'tup' (dict or row)
+    """
+    return bind_theory(cpt, tup.keys(), row_positions(tup))
+
+
+def compile_function(arguments, expression, namespace):
+    """
+    Return a function with 'arguments' returning 'expression'
+
+    Names used by 'expression' (like interval limits) are in 'namespace'
+    """
+    source = 'def generated({args}):\n    return {exp}\n'.format(
+        args=arguments, exp=expression)
+    function_namespace = namespace.copy()
+    exec compile(source, '<cprefsql>', 'exec') in function_namespace
+    return function_namespace['generated']
+
+
+def new_namespace(position_dict):
+    """
+    Return a namespace to generated functions
+
+    Values of rows are read by position using 'item' (tuple indexing)
+    """
+    if position_dict is None:
+        return {}
+    return {'__positions': position_dict, 'item': tuple.__getitem__}
+
+
+def value_source(tuple_name, att, namespace):
+    """
+    Return source of value of 'att' in tuple 'tuple_name'
+    """
+    if '__positions' in namespace:
+        return 'item({t}, {p})'.format(
+            t=tuple_name, p=namespace['__positions'][att])
+    return '{t}[{a}]'.format(t=tuple_name, a=repr(att))
+
+
+def limit_name(limit, namespace):
+    """
+    Return name of 'limit' in 'namespace' (it is added if necessary)
+    """
+    name = 'limit{n}'.format(n=len(namespace))
+    namespace[name] = limit
+    return name
+
+
+def interval_source(value_source, interval, namespace):
+    """
+    Return source of test of 'value_source' inside 'interval'
+
+    Unbounded limits are not tested
+    """
+    predicate = IntervalPredicate(interval)
+    source = value_source
+    if predicate.left_limit is not MINUS_INFINITY:
+        operator = '<' if interval[1] == '<' else '<='
+        source = limit_name(predicate.left_limit, namespace) + ' ' + \
+            operator + ' ' + source
+    if predicate.right_limit is not PLUS_INFINITY:
+        operator = '<' if interval[2] == '<' else '<='
+        source = source + ' ' + operator + ' ' + \
+            limit_name(predicate.right_limit, namespace)
+    if source == value_source:
+        return 'True'
+    return source
+
+
+def formula_source(tuple_name, formula, att_list, namespace):
+    """
+    Return source of test of tuple 'tuple_name' against 'formula'
+
+    A formula over an attribute out of 'att_list' is never satisfied
+    """
+    source_list = []
+    for att in sorted(formula):
+        if att not in att_list:
+            return 'False'
+        source_list.append(interval_source(
+            value_source(tuple_name, att, namespace), formula[att],
+            namespace))
+    if source_list == []:
+        return 'True'
+    return ' and '.join(source_list)
+
+
+def dominance_source(comparison, equal_att_list, att_list, namespace):
+    """
+    Return source of dominance test of 'tuple1' over 'tuple2'
+    according to 'comparison'
+    """
+    source_list = [formula_source('tuple1', comparison.pref_formula_dict,
+                                  att_list, namespace),
+                   formula_source('tuple2', comparison.not_pref_formula_dict,
+                                  att_list, namespace)]
+    for att in equal_att_list:
+        source_list.append(value_source('tuple1', att, namespace) + ' == ' +
+                           value_source('tuple2', att, namespace))
+    return ' and '.join(source_list)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Module to compute the best tuples using columnar arrays (NumPy)
+
+Tuples are converted to an array for each attribute. Numeric columns
+are used directly and other columns are encoded by position of their
+values in the sorted list of distinct values, so interval tests are
+comparisons of codes. Formulas of comparisons are evaluated as boolean
+masks and partitions are identified by group ids.
+
+NumPy is optional, when it is not available 'numpy' is None and
+partition algorithms use tuples directly.
+"""
+
+from bisect import bisect_left, bisect_right
+from cp_interval import IntervalPredicate, MINUS_INFINITY, PLUS_INFINITY
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Types of values used directly in numeric arrays
+NUMERIC_TYPES = (int, long, float)
+# Minimum number of tuples to use columnar arrays (smaller inputs are
+# faster with tuples)
+COLUMNAR_MIN_TUPLES = 1000
+
+
+class Column(object):
+    """
+    Values of an attribute in columnar format
+
+    Attributes:
+        values (list): Original values
+        array (numpy.ndarray): Numeric values (None if some value
+            is not a number)
+    """
+
+    def __init__(self, values):
+        """
+        Create a column from list 'values'
+        """
+        self.values = values
+        self.array = None
+        if all(type(value) in NUMERIC_TYPES for value in values):
+            self.array = numpy.array(values)
+        self.__sorted_values = None
+        self.__codes = None
+
+    def sorted_values(self):
+        """
+        Return sorted list of distinct values
+        """
+        if self.__sorted_values is None:
+            self.__sorted_values = sorted(set(self.values))
+        return self.__sorted_values
+
+    def codes(self):
+        """
+        Return array of codes of values (positions in sorted_values)
+
+        Codes keep order of values
+        """
+        if self.__codes is None:
+            code_dict = {value: code for code, value
+                         in enumerate(self.sorted_values())}
+            self.__codes = numpy.array([code_dict[value]
+                                        for value in self.values],
+                                       dtype=numpy.intp)
+        return self.__codes
+
+    def interval_mask(self, interval):
+        """
+        Return a boolean mask of values inside 'interval'
+        """
+        predicate = IntervalPredicate(interval)
+        limit_list = [limit for limit in (predicate.left_limit,
+                                          predicate.right_limit)
+                      if limit is not MINUS_INFINITY
+                      and limit is not PLUS_INFINITY]
+        if self.array is not None \
+        and all(type(limit) in NUMERIC_TYPES for limit in limit_list):
+            values = self.array
+            low = predicate.left_limit
+            high = predicate.right_limit
+        else:
+            # Translate limits to codes
+            values = self.codes()
+            sorted_values = self.sorted_values()
+            low = predicate.left_limit
+            if low is not MINUS_INFINITY:
+                # First code after (or equal to) left limit
+                if interval[1] == '<':
+                    low = bisect_right(sorted_values, low)
+                else:
+                    low = bisect_left(sorted_values, low)
+                interval = (low, '<=', interval[2], interval[3])
+            high = predicate.right_limit
+            if high is not PLUS_INFINITY:
+                # First code after (or equal to) right limit
+                if interval[2] == '<':
+                    high = bisect_left(sorted_values, high)
+                else:
+                    high = bisect_right(sorted_values, high)
+                interval = (interval[0], interval[1], '<', high)
+        mask = numpy.ones(len(self.values), dtype=bool)
+        if low is not MINUS_INFINITY:
+            if interval[1] == '<':
+                mask &= values > low
+            else:
+                mask &= values >= low
+        if high is not PLUS_INFINITY:
+            if interval[2] == '<':
+                mask &= values < high
+            else:
+                mask &= values <= high
+        return mask
+
+
+class ColumnBatch(object):
+    """
+    Batch of tuples in columnar format
+
+    Attributes:
+        size (int): Number of tuples
+        column_dict (dict): Column of each attribute
+    """
+
+    def __init__(self, tuples_list):
+        """
+        Create a batch from 'tuples_list' (tuples must have
+        the same attributes)
+        """
+        self.size = len(tuples_list)
+        self.column_dict = {}
+        if self.size > 0:
+            for att in tuples_list[0]:
+                self.column_dict[att] = Column([tup[att]
+                                                for tup in tuples_list])
+
+    def formula_mask(self, formula):
+        """
+        Return a boolean mask of tuples satisfying 'formula'
+        """
+        mask = numpy.ones(self.size, dtype=bool)
+        for att in formula:
+            if att not in self.column_dict:
+                return numpy.zeros(self.size, dtype=bool)
+            mask &= self.column_dict[att].interval_mask(formula[att])
+        return mask
+
+    def group_ids(self, att_set):
+        """
+        Return an array with the group id of each tuple, where groups are
+        value combinations of attributes 'att_set'
+        """
+        ids = numpy.zeros(self.size, dtype=numpy.intp)
+        for att in sorted(att_set):
+            codes = self.column_dict[att].codes()
+            ids = ids * (codes.max() + 1) + codes
+            # Keep ids small
+            ids = numpy.unique(ids, return_inverse=True)[1]
+        return ids
+
+
+def use_columnar(tuples_list):
+    """
+    Check if columnar arrays should be used to 'tuples_list'
+    """
+    return numpy is not None and len(tuples_list) >= COLUMNAR_MIN_TUPLES
+
+
+def most_preferred_columnar(cpt, tuples_list):
+    """Return dominant tuples from 'tuples_list'
+    according to comparisons of theory 'cpt'
+
+    Same result of partition method, but tuples are in input order.
+    Raise TypeError if some value can not be encoded (not hashable)"""
+    if len(tuples_list) == 0:
+        return []
+    batch = ColumnBatch(tuples_list)
+    tuples_att_set = set(batch.column_dict)
+    # Tuples not removed by previous comparisons
+    alive = numpy.ones(batch.size, dtype=bool)
+    for comp in cpt.comparisons_over(tuples_att_set):
+        preferred = batch.formula_mask(comp.pref_formula_dict) & alive
+        if not preferred.any():
+            continue
+        not_preferred = batch.formula_mask(comp.not_pref_formula_dict) \
+            & alive & ~preferred
+        att_set = tuples_att_set.difference(comp.preference_att_set())
+        ids = batch.group_ids(att_set)
+        # Partitions with preferred tuples
+        num_preferred = numpy.bincount(ids[preferred], minlength=ids.max() + 1)
+        # Not preferred tuples of these partitions are dominated
+        alive &= ~(not_preferred & (num_preferred[ids] > 0))
+    return [tuples_list[index] for index in numpy.flatnonzero(alive)]
@@ -3,7 +3,7 @@
 Module to manipulate each contextual preference rule
 """
 
-from cp_interval import interval_str, value_in_interval
+from cp_interval import interval_str, IntervalPredicate
 
 
 class CPComparison(object):
@@ -11,14 +11,8 @@ class CPComparison(object):
     Class to represent tuple comparisons directly
     """
 
-    # Preferred formula
-    pref_formula_dict = {}
-    # Not preferred formula
-    not_pref_formula_dict = {}
-    # Preferred indifferent set
-    pref_indif_set = set()
-    # Preferred indifferent set
-    not_pref_indif_set = set()
+    __slots__ = ('pref_formula_dict', 'not_pref_formula_dict',
+                 'pref_indif_set', 'not_pref_indif_set', 'predicate')
 
     def __init__(self, pref_formula_dict, not_pref_formula_dict,
                  pref_indif_set, not_pref_indif_set):
@@ -30,14 +24,8 @@ class CPComparison(object):
         self.not_pref_formula_dict = not_pref_formula_dict.copy()
         self.pref_indif_set = pref_indif_set.copy()
         self.not_pref_indif_set = not_pref_indif_set.copy()
-
-    def __del__(self):
-        self.pref_formula_dict.clear()
-        self.not_pref_formula_dict.clear()
-        del self.pref_formula_dict
-        del self.not_pref_formula_dict
-        del self.pref_indif_set
-        del self.not_pref_indif_set
+        # Compiled predicates (see compile())
+        self.predicate = None
 
     def __str__(self):
         tmp_str = str_formula(self.pref_formula_dict)
@@ -63,6 +51,25 @@ class CPComparison(object):
         else:
             return 1
 
+    def key(self):
+        """
+        Return a hashable key of comparison (equal comparisons have
+        equal keys)
+        """
+        return (formula_key(self.pref_formula_dict),
+                formula_key(self.not_pref_formula_dict),
+                frozenset(self.pref_indif_set),
+                frozenset(self.not_pref_indif_set))
+
+    def to_tuple(self):
+        """
+        Return comparison in a compact tuple format (used to store theories)
+        """
+        return (tuple(sorted(self.pref_formula_dict.items())),
+                tuple(sorted(self.not_pref_formula_dict.items())),
+                tuple(sorted(self.pref_indif_set)),
+                tuple(sorted(self.not_pref_indif_set)))
+
     def preference_att_set(self):
         """
         Return a set with all attribute of comparison
@@ -73,26 +80,26 @@ class CPComparison(object):
         att_set = att_set.union(self.pref_indif_set)
         return att_set
 
+    def compile(self):
+        """
+        Return compiled predicates of comparison (compiled only once)
+        """
+        if self.predicate is None:
+            self.predicate = ComparisonPredicate(self.pref_formula_dict,
+                                                 self.not_pref_formula_dict)
+        return self.predicate
+
     def preferred(self, tup):
         """
         Check if 'tup' satisfies preferred values
         """
-        for att in self.pref_formula_dict:
-            if att not in tup \
-            or not value_in_interval(tup[att], self.pref_formula_dict[att]):
-                return False
-        return True
+        return self.compile().preferred(tup)
 
     def not_preferred(self, tup):
         """
         Check if 'tup' satisfies not preferred values
         """
-        for att in self.not_pref_formula_dict:
-            if att not in tup \
-            or not value_in_interval(tup[att],
-                                     self.not_pref_formula_dict[att]):
-                return False
-        return True
+        return self.compile().not_preferred(tup)
 
     def dominates(self, tuple1, tuple2):
         """
@@ -130,10 +137,11 @@ class CPComparison(object):
         """
         for comp in comp_list:
             # Check if 'self' formulas are sub-formulas of 'comp' formulas
-            if self != comp \
-            and is_subformula(self.pref_formula_dict, comp.pref_formula_dict) \
+            # (formulas are tested before comparisons, they are cheaper)
+            if is_subformula(self.pref_formula_dict, comp.pref_formula_dict) \
             and is_subformula(self.not_pref_formula_dict,
-                              comp.not_pref_formula_dict):
+                              comp.not_pref_formula_dict) \
+            and self != comp:
                 pref_diff = difference_formula(self.pref_formula_dict,
                                                comp.pref_formula_dict)
                 not_pref_diff = difference_formula(self.not_pref_formula_dict,
@@ -153,6 +161,60 @@ class CPComparison(object):
         return True
 
 
+class ComparisonPredicate(object):
+    """
+    Compiled tests of preferred and not preferred formulas of a comparison
+
+    Each formula is a list of pairs of attribute and test function of a
+    compiled interval (see IntervalPredicate)
+    """
+
+    __slots__ = ('pref_list', 'not_pref_list')
+
+    def __init__(self, pref_formula_dict, not_pref_formula_dict):
+        """
+        Compile preferred and not preferred formulas
+        """
+        self.pref_list = [(att, IntervalPredicate(interval).test)
+                          for att, interval in pref_formula_dict.items()]
+        self.not_pref_list = [(att, IntervalPredicate(interval).test)
+                              for att, interval
+                              in not_pref_formula_dict.items()]
+
+    def preferred(self, tup):
+        """
+        Check if 'tup' satisfies preferred values
+        """
+        for att, predicate in self.pref_list:
+            if att not in tup or not predicate(tup[att]):
+                return False
+        return True
+
+    def not_preferred(self, tup):
+        """
+        Check if 'tup' satisfies not preferred values
+        """
+        for att, predicate in self.not_pref_list:
+            if att not in tup or not predicate(tup[att]):
+                return False
+        return True
+
+
+def comparison_from_tuple(comp_tuple):
+    """
+    Create a CPComparison from a tuple generated by CPComparison.to_tuple()
+    """
+    return CPComparison(dict(comp_tuple[0]), dict(comp_tuple[1]),
+                        set(comp_tuple[2]), set(comp_tuple[3]))
+
+
+def formula_key(formula):
+    """
+    Return a hashable key of 'formula' (pairs of attribute and interval)
+    """
+    return frozenset(formula.iteritems())
+
+
 def str_formula(formula):
     """
     Convert a formula stored in dictionary in a string
@@ -15,11 +15,11 @@ class CPGraph(object):
     this function is used to check preferences consistency
 
     Attributes:
-        __graph_dict: dictionary to store vertices and edges
+        __graph_dict: dictionary to store vertices and their successors
+            (set of vertices)
     """
 
-    # Dictionary do store vertex and edges
-    __graph_dict = {}
+    __slots__ = ('__graph_dict',)
 
     def __init__(self):
         """
@@ -30,10 +30,6 @@ class CPGraph(object):
     def __str__(self):
         return str(self.__graph_dict)
 
-    def __del__(self):
-        self.__graph_dict.clear()
-        del self.__graph_dict
-
     def vertices(self):
         """
         Returns the vertices of a graph
@@ -45,7 +41,7 @@ class CPGraph(object):
         Add a 'vertex' to graph
         """
         if vertex not in self.__graph_dict:
-            self.__graph_dict[vertex] = []
+            self.__graph_dict[vertex] = set()
 
     def add_edge(self, vertex1, vertex2):
         """
@@ -57,8 +53,7 @@ class CPGraph(object):
             self.add_vertex(vertex1)
         if vertex2 not in self.__graph_dict:
             self.add_vertex(vertex2)
-        if vertex2 not in self.__graph_dict[vertex1]:
-            self.__graph_dict[vertex1].append(vertex2)
+        self.__graph_dict[vertex1].add(vertex2)
 
     def depth_first_search(self, start_vertex, goal_vertex):
         """
@@ -67,7 +62,7 @@ class CPGraph(object):
         The search start at 'star_vertex' and try reach at 'goal_vertex'
         """
         # Visited vertex
-        visited_list = [start_vertex]
+        visited_set = set([start_vertex])
         # Next vertices to be visited_list
         waiting_list = []
         for vertex in self.__graph_dict[start_vertex]:
@@ -79,22 +74,165 @@ class CPGraph(object):
             # Check if 'goal_vertex' was reached
             if next_vertex == goal_vertex:
                 return True
-            # Check if 'next_vertex' was be visited_list
-            if next_vertex not in visited_list:
-                # Add 'next_vertex' to 'visited_list'
-                visited_list.append(next_vertex)
+            # Check if 'next_vertex' was be visited
+            if next_vertex not in visited_set:
+                # Add 'next_vertex' to 'visited_set'
+                visited_set.add(next_vertex)
                 # Next vertices to be visited_list
                 for vertex in self.__graph_dict[next_vertex]:
                     waiting_list.append(vertex)
         # Return false if 'goal_vertex' was not reached
         return False
 
+    def reachable_set(self, start_vertex):
+        """
+        Return the set of vertices reached from 'start_vertex'
+        (including itself)
+        """
+        reached_set = set([start_vertex])
+        waiting_list = [start_vertex]
+        while waiting_list != []:
+            vertex = waiting_list.pop()
+            for successor in self.__graph_dict[vertex]:
+                if successor not in reached_set:
+                    reached_set.add(successor)
+                    waiting_list.append(successor)
+        return reached_set
+
     def is_acyclic(self):
         """
         Check if the graph is acyclic
         """
-        # Call depth first search form each vertex to itself
+        return self.find_cycle() is None
+
+    def find_cycle(self):
+        """
+        Return a cycle of graph as a list of vertices, where first and
+        last vertices are the same (None if graph is acyclic)
+
+        A single depth first search over all vertices is done, a cycle is
+        found when an edge reaches a vertex in current path
+        """
+        # Vertices in current path (with their position) and
+        # vertices already finished
+        path_list = []
+        path_dict = {}
+        finished_set = set()
+        for root in self.__graph_dict:
+            if root in finished_set:
+                continue
+            path_dict[root] = 0
+            path_list.append(root)
+            # Successors not visited yet of each vertex in path
+            iterator_list = [iter(self.__graph_dict[root])]
+            while iterator_list != []:
+                vertex = path_list[-1]
+                for successor in iterator_list[-1]:
+                    if successor in path_dict:
+                        # Edge back to path
+                        return path_list[path_dict[successor]:] + \
+                            [successor]
+                    if successor not in finished_set:
+                        path_dict[successor] = len(path_list)
+                        path_list.append(successor)
+                        iterator_list.append(
+                            iter(self.__graph_dict[successor]))
+                        break
+                else:
+                    # All successors of 'vertex' are finished
+                    iterator_list.pop()
+                    path_list.pop()
+                    del path_dict[vertex]
+                    finished_set.add(vertex)
+        return None
+
+    def component_dict(self):
+        """
+        Return a dictionary with the strongly connected component
+        (a number) of each vertex
+
+        Vertices are in the same component when each one reaches
+        the other one (Kosaraju algorithm)
+        """
+        # Vertices in order of end of depth first search
+        finished_list = []
+        visited_set = set()
+        for root in self.__graph_dict:
+            if root in visited_set:
+                continue
+            visited_set.add(root)
+            stack = [(root, iter(self.__graph_dict[root]))]
+            while stack != []:
+                vertex, successor_iter = stack[-1]
+                for successor in successor_iter:
+                    if successor not in visited_set:
+                        visited_set.add(successor)
+                        stack.append((successor,
+                                      iter(self.__graph_dict[successor])))
+                        break
+                else:
+                    stack.pop()
+                    finished_list.append(vertex)
+        # Reverse graph
+        predecessor_dict = {vertex: [] for vertex in self.__graph_dict}
+        for vertex in self.__graph_dict:
+            for successor in self.__graph_dict[vertex]:
+                predecessor_dict[successor].append(vertex)
+        # Components are vertices reached in reverse graph
+        component_dict = {}
+        for root in reversed(finished_list):
+            if root in component_dict:
+                continue
+            component = len(component_dict)
+            component_dict[root] = component
+            waiting_list = [root]
+            while waiting_list != []:
+                vertex = waiting_list.pop()
+                for predecessor in predecessor_dict[vertex]:
+                    if predecessor not in component_dict:
+                        component_dict[predecessor] = component
+                        waiting_list.append(predecessor)
+        return component_dict
+
+    def topological_sort(self):
+        """
+        Return a list of vertices where each vertex is before its successors
+
+        If the graph has a cycle, None is returned
+        """
+        # Number of edges reaching each vertex
+        in_degree_dict = {vertex: 0 for vertex in self.__graph_dict}
         for vertex in self.__graph_dict:
-            if self.depth_first_search(vertex, vertex):
-                return False
-        return True
+            for successor in self.__graph_dict[vertex]:
+                in_degree_dict[successor] += 1
+        # Vertices without predecessors (in insertion order)
+        waiting_list = [vertex for vertex in self.__graph_dict
+                        if in_degree_dict[vertex] == 0]
+        sorted_list = []
+        while waiting_list != []:
+            vertex = waiting_list.pop(0)
+            sorted_list.append(vertex)
+            for successor in self.__graph_dict[vertex]:
+                in_degree_dict[successor] -= 1
+                if in_degree_dict[successor] == 0:
+                    waiting_list.append(successor)
+        if len(sorted_list) != len(self.__graph_dict):
+            return None
+        return sorted_list
+
+    def longest_path_dict(self):
+        """
+        Return a dictionary with the length of longest path reaching
+        each vertex (vertices without predecessors have length 0)
+
+        If the graph has a cycle, None is returned
+        """
+        sorted_list = self.topological_sort()
+        if sorted_list is None:
+            return None
+        length_dict = {vertex: 0 for vertex in sorted_list}
+        for vertex in sorted_list:
+            for successor in self.__graph_dict[vertex]:
+                length_dict[successor] = max(length_dict[successor],
+                                             length_dict[vertex] + 1)
+        return length_dict
@@ -9,6 +9,130 @@ Examples:
     A > a1 is represented as (a1, '<', '', '')
 """
 
+from bisect import bisect_left, bisect_right
+from operator import lt, le
+
+
+class Infinity(object):
+    """
+    Sentinel value greater (or lower, when negative) than any other value
+
+    Used as limit of unbounded sides of compiled intervals
+    """
+
+    __slots__ = ('negative',)
+
+    def __init__(self, negative=False):
+        """
+        Create a positive (or negative) infinity
+        """
+        self.negative = negative
+
+    def __repr__(self):
+        if self.negative:
+            return '-inf'
+        return '+inf'
+
+    def __hash__(self):
+        return hash(self.negative)
+
+    def __eq__(self, other):
+        return other is self
+
+    def __ne__(self, other):
+        return other is not self
+
+    def __lt__(self, other):
+        return self.negative and other is not self
+
+    def __le__(self, other):
+        return self.negative or other is self
+
+    def __gt__(self, other):
+        return not self.negative and other is not self
+
+    def __ge__(self, other):
+        return not self.negative or other is self
+
+
+MINUS_INFINITY = Infinity(True)
+PLUS_INFINITY = Infinity()
+
+
+class IntervalPredicate(object):
+    """
+    Compiled test of values inside an interval
+
+    Unbounded limits are replaced by infinity sentinels and operators are
+    resolved when the interval is compiled. The test function 'test'
+    compares values only against bounded limits (a sentinel limit
+    always holds)
+
+    Attributes:
+        left_limit: Left limit (MINUS_INFINITY when unbounded)
+        left_operator (function): Test of left limit against value
+        right_limit: Right limit (PLUS_INFINITY when unbounded)
+        right_operator (function): Test of value against right limit
+        test (function): Check if a value is in interval
+    """
+
+    __slots__ = ('left_limit', 'left_operator', 'right_limit',
+                 'right_operator', 'test')
+
+    def __init__(self, interval):
+        """
+        Compile a tuple 'interval'
+        """
+        if interval[1] == '':
+            self.left_limit = MINUS_INFINITY
+        else:
+            self.left_limit = interval[0]
+        if interval[1] == '<':
+            self.left_operator = lt
+        else:
+            self.left_operator = le
+        if interval[2] == '':
+            self.right_limit = PLUS_INFINITY
+        else:
+            self.right_limit = interval[3]
+        if interval[2] == '<':
+            self.right_operator = lt
+        else:
+            self.right_operator = le
+        self.test = self.__build_test()
+
+    def __build_test(self):
+        """
+        Return a test function specialized to limits and operators
+        """
+        low = self.left_limit
+        high = self.right_limit
+        left_lt = self.left_operator is lt
+        right_lt = self.right_operator is lt
+        if low is MINUS_INFINITY and high is PLUS_INFINITY:
+            return lambda value: True
+        elif low is MINUS_INFINITY:
+            if right_lt:
+                return lambda value: value < high
+            return lambda value: value <= high
+        elif high is PLUS_INFINITY:
+            if left_lt:
+                return lambda value: low < value
+            return lambda value: low <= value
+        elif left_lt and right_lt:
+            return lambda value: low < value < high
+        elif left_lt:
+            return lambda value: low < value <= high
+        elif right_lt:
+            return lambda value: low <= value < high
+        return lambda value: low <= value <= high
+
+    def __call__(self, value):
+        """
+        Check if 'value' is in interval (same as value_in_interval)
+        """
+        return self.test(value)
+
 
 def __left_equal(interval1, interval2):
     """
@@ -254,6 +378,74 @@ def split_interval(fixed_interval, split_interval):
     return interval_list
 
 
+def interval_cuts(interval):
+    """
+    Return left and right cuts of 'interval' (None when unbounded)
+
+    A cut is a pair (value, side), where side 0 is just before value and
+    side 1 is just after value, so cuts are ordered as pairs
+    """
+    if interval[1] == '':
+        left_cut = None
+    elif interval[1] == '<':
+        left_cut = (interval[0], 1)
+    else:
+        left_cut = (interval[0], 0)
+    if interval[2] == '':
+        right_cut = None
+    elif interval[2] == '<':
+        right_cut = (interval[3], 0)
+    else:
+        right_cut = (interval[3], 1)
+    return left_cut, right_cut
+
+
+def cut_interval(left_cut, right_cut):
+    """
+    Return the interval between cuts 'left_cut' and 'right_cut'
+    """
+    if left_cut is None:
+        left_limit, left_operator = '', ''
+    elif left_cut[1] == 0:
+        left_limit, left_operator = left_cut[0], '<='
+    else:
+        left_limit, left_operator = left_cut[0], '<'
+    if right_cut is None:
+        right_operator, right_limit = '', ''
+    elif right_cut[1] == 0:
+        right_operator, right_limit = '<', right_cut[0]
+    else:
+        right_operator, right_limit = '<=', right_cut[0]
+    if left_cut is not None and right_cut is not None \
+    and left_limit == right_limit:
+        return (left_limit, '=', '=', right_limit)
+    return (left_limit, left_operator, right_operator, right_limit)
+
+
+def elementary_intervals(interval, cut_list):
+    """
+    Split 'interval' in all cuts of sorted list 'cut_list' inside it
+
+    Return a list of disjoint intervals in ascending order
+    ('interval' itself when no cut is inside it). Same intervals
+    generated by split_interval repeated until no overlap remains
+    """
+    left_cut, right_cut = interval_cuts(interval)
+    if left_cut is None:
+        start = 0
+    else:
+        start = bisect_right(cut_list, left_cut)
+    if right_cut is None:
+        end = len(cut_list)
+    else:
+        end = bisect_left(cut_list, right_cut)
+    if start >= end:
+        return [interval]
+    bound_list = [left_cut] + cut_list[start:end] + [right_cut]
+    return [cut_interval(bound_list[index], bound_list[index + 1])
+            for index in range(len(bound_list) - 1)]
+
+
 def value_in_interval(value, interval):
     """
     Check if a value is in a interval
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Module to sort tuples in an order compatible with preferences
+
+If a tuple dominates another one according to a theory,
+then the key of the first tuple is lower than the key of the second one
+"""
+
+from cp_graph import CPGraph
+from cp_interval import tuple_has_interval, value_in_interval
+
+
+class CPOrder(object):
+    """
+    Class to compute sort keys of tuples according to a theory
+
+    Key of a tuple is a list with a rank for each preference attribute.
+    Attributes are in topological order of theory attribute graph
+    (antecedent attributes and preference attribute before indifferent
+    attributes). The rank of a preference attribute is the longest path
+    reaching its interval in graph of preferred and not preferred intervals
+    of rules valid for the tuple.
+
+    Attributes:
+        att_list (list): Preference attributes in topological order
+    """
+
+    def __init__(self, cpt):
+        """
+        Create a CPOrder from a CPTheory 'cpt'
+        """
+        self.att_list = []
+        # Rules by preference attribute
+        self.__rules_dict = {}
+        # Ranks of intervals by attribute and valid rules
+        self.__rank_dict = {}
+        sorted_list = cpt.attribute_graph().topological_sort()
+        if sorted_list is None:
+            raise ValueError('Theory is not globally consistent')
+        for att in sorted_list:
+            if att in cpt.preference_att_set:
+                self.att_list.append(att)
+                self.__rules_dict[att] = [cpr for cpr in cpt.rules_list
+                                          if cpr.attribute == att]
+
+    def __interval_rank_dict(self, att, rules_id):
+        """
+        Return ranks of intervals of 'att' according to rules of 'att'
+        with indexes in 'rules_id'
+        """
+        if (att, rules_id) not in self.__rank_dict:
+            graph = CPGraph()
+            for index in rules_id:
+                cpr = self.__rules_dict[att][index]
+                graph.add_edge(cpr.preferred, cpr.not_preferred)
+            rank_dict = graph.longest_path_dict()
+            if rank_dict is None:
+                raise ValueError('Theory is not locally consistent')
+            self.__rank_dict[(att, rules_id)] = rank_dict
+        return self.__rank_dict[(att, rules_id)]
+
+    def rank(self, tup, att):
+        """
+        Return rank of value of 'att' in 'tup'
+        """
+        # Rules of 'att' where 'tup' satisfies antecedent
+        rules_id = []
+        for index, cpr in enumerate(self.__rules_dict[att]):
+            for ant in cpr.antecedents_dict:
+                if not tuple_has_interval(tup, ant,
+                                          cpr.antecedents_dict[ant]):
+                    break
+            else:
+                rules_id.append(index)
+        rank_dict = self.__interval_rank_dict(att, tuple(rules_id))
+        # Get rank of interval where value of 'att' is
+        if att in tup:
+            for interval in rank_dict:
+                if value_in_interval(tup[att], interval):
+                    return rank_dict[interval]
+        return 0
+
+    def key(self, tup):
+        """
+        Return sort key of 'tup'
+        """
+        return [self.rank(tup, att) for att in self.att_list]
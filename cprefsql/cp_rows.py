@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Module to store tuples in a compact format
+
+Tuples returned by plpy are dicts, with hundreds of bytes of overhead
+per tuple. Rows are tuples of values of a class shared by all tuples
+with the same attributes. The class has the attribute names and their
+positions, so a row can be used like a dict by the algorithms
+(row[att], att in row, iteration over attributes, keys()).
+
+Rows are converted back to dicts only when they are returned.
+"""
+
+# Row classes by attribute tuple
+__ROW_CLASS_DICT = {}
+
+
+class Row(tuple):
+    """
+    Tuple of values accessed by attribute name
+
+    Rows are compared and hashed by their values
+
+    Attributes:
+        att_tuple (tuple): Attribute names (shared by class)
+        position_dict (dict): Position of each attribute (shared by class)
+    """
+
+    __slots__ = ()
+
+    att_tuple = ()
+    position_dict = {}
+
+    def __getitem__(self, att):
+        return tuple.__getitem__(self, self.position_dict[att])
+
+    def __contains__(self, att):
+        return att in self.position_dict
+
+    def __iter__(self):
+        return iter(self.att_tuple)
+
+    def __reduce__(self):
+        return (make_row, (self.att_tuple, self.values()))
+
+    def __repr__(self):
+        return repr(row_dict(self))
+
+    def get(self, att, default=None):
+        """
+        Return value of 'att' ('default' if row has no 'att')
+        """
+        if att in self.position_dict:
+            return tuple.__getitem__(self, self.position_dict[att])
+        return default
+
+    def keys(self):
+        """
+        Return list of attributes
+        """
+        return list(self.att_tuple)
+
+    def values(self):
+        """
+        Return tuple of values (in order of attributes)
+        """
+        return tuple(tuple.__iter__(self))
+
+    def items(self):
+        """
+        Return list of pairs of attribute and value
+        """
+        return zip(self.att_tuple, tuple.__iter__(self))
+
+    def iteritems(self):
+        """
+        Generate pairs of attribute and value
+        """
+        return iter(self.items())
+
+
+def row_class(att_tuple):
+    """
+    Return the Row class of attributes 'att_tuple' (classes are cached)
+    """
+    if att_tuple not in __ROW_CLASS_DICT:
+        __ROW_CLASS_DICT[att_tuple] = type('Row', (Row,), {
+            '__slots__': (),
+            'att_tuple': att_tuple,
+            'position_dict': {att: position for position, att
+                              in enumerate(att_tuple)}})
+    return __ROW_CLASS_DICT[att_tuple]
+
+
+def make_row(att_tuple, values):
+    """
+    Create a row with attributes 'att_tuple' and 'values'
+    """
+    return row_class(att_tuple)(values)
+
+
+def row_positions(tup):
+    """
+    Return positions of attributes of 'tup' (None if it is not a row)
+    """
+    if isinstance(tup, Row):
+        return tup.position_dict
+    return None
+
+
+def row_dict(tup):
+    """
+    Return 'tup' as a dict (dicts are returned directly)
+    """
+    if isinstance(tup, Row):
+        return dict(zip(tup.att_tuple, tuple.__iter__(tup)))
+    return tup
+
+
+def iter_rows(tuples_iter):
+    """
+    Generate rows of tuples from 'tuples_iter'
+
+    Attributes are got from first tuple and they are sorted.
+    Rows are generated directly
+    """
+    cls = None
+    for tup in tuples_iter:
+        if isinstance(tup, Row):
+            yield tup
+            continue
+        if cls is None:
+            cls = row_class(tuple(sorted(tup)))
+        yield cls(tup[att] for att in cls.att_tuple)
+
+
+def compact_rows(tuples_iter):
+    """
+    Return a list of rows of tuples from 'tuples_iter'
+    """
+    return list(iter_rows(tuples_iter))
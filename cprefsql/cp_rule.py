@@ -3,8 +3,9 @@
 Module to manipulate each contextual preference rule
 """
 
+from itertools import product
 from cp_interval import create_interval, split_interval, interval_str, \
-                        tuple_has_interval
+                        tuple_has_interval, interval_cuts, elementary_intervals
 
 
 class CPRule(object):
@@ -19,16 +20,8 @@ class CPRule(object):
         indifferent_att_set (set): Set of indifferent attributes
     """
 
-    # Antecedent terms of rule
-    antecedents_dict = {}
-    # Main attribute of rule
-    attribute = ''
-    # Values preferred to main attribute
-    preferred = ()
-    # Values not preferred to main attribute
-    not_preferred = ()
-    # Indifferent attributes of rule
-    indifferent_att_set = set()
+    __slots__ = ('antecedents_dict', 'attribute', 'preferred',
+                 'not_preferred', 'indifferent_att_set')
 
     def __init__(self, parse_result=None):
         """
@@ -67,15 +60,6 @@ class CPRule(object):
             self.indifferent_att_set = set(
                                         parse_result.indifferent_attributes)
 
-    def __del__(self):
-        self.antecedents_dict.clear()
-        del self.antecedents_dict
-        del self.attribute
-        del self.preferred
-        del self.not_preferred
-        self.indifferent_att_set.clear()
-        del self.indifferent_att_set
-
     def __str__(self):
         tmp = ''
         if len(self.antecedents_dict):
@@ -131,6 +115,14 @@ class CPRule(object):
         cpr.indifferent_att_set = self.indifferent_att_set.copy()
         return cpr
 
+    def to_tuple(self):
+        """
+        Return rule in a compact tuple format (used to store rules)
+        """
+        return (tuple(sorted(self.antecedents_dict.items())), self.attribute,
+                self.preferred, self.not_preferred,
+                tuple(sorted(self.indifferent_att_set)))
+
     def get_antecedent_att_set(self):
         """
         Get a set of attributes present in the antecedent
@@ -202,15 +194,22 @@ class CPRule(object):
         # Check if 'tup' has the preferred value
         if not tuple_has_interval(tup, self.attribute, self.preferred):
             return None
+        # Check if tuple validates antecedent
+        for att in self.antecedents_dict:
+            if att in tup \
+            and not tuple_has_interval(tup, att, self.antecedents_dict[att]):
+                return None
+        return self.switch_tuple(tup)
+
+    def switch_tuple(self, tup):
+        """
+        Generate a new tuple switching preferred value of 'tup' to
+        not preferred value (rule is not checked)
+        """
         # Copy 'tup' to 'new_tuple' and do not consider indifferent attributes
         new_tup = {}
         for att in tup:
-            # Check if tuple validates antecedent
-            if att in self.antecedents_dict \
-            and not tuple_has_interval(tup, att, self.antecedents_dict[att]):
-                return None
-            # Do not consider indifferent attributes
-            elif att not in self.indifferent_att_set:
+            if att not in self.indifferent_att_set:
                 new_tup[att] = tup[att]
         # Switch preference attribute
         new_tup[self.attribute] = self.not_preferred
@@ -238,6 +237,19 @@ class CPRule(object):
         return new_formula
 
 
+def rule_from_tuple(rule_tuple):
+    """
+    Create a CPRule from a tuple generated by CPRule.to_tuple()
+    """
+    cpr = CPRule()
+    cpr.antecedents_dict = dict(rule_tuple[0])
+    cpr.attribute = rule_tuple[1]
+    cpr.preferred = rule_tuple[2]
+    cpr.not_preferred = rule_tuple[3]
+    cpr.indifferent_att_set = set(rule_tuple[4])
+    return cpr
+
+
 def split_antecedents(rule, attribute, fixed_interval):
     """
     Split rule if fixed_interval interval overlaps some interval from
@@ -311,3 +323,60 @@ def split_rule_auxiliary(rule, att, fixed_interval):
         # Try split not preferred interval of 'rule'
         new_rules_list = split_not_preferred(rule, att, fixed_interval)
     return new_rules_list
+
+
+def rule_cuts(rules_list):
+    """
+    Return sorted cuts of intervals of 'rules_list' by attribute
+    (see cp_interval.interval_cuts)
+    """
+    cut_dict = {}
+    for rule in rules_list:
+        att_interval_list = rule.antecedents_dict.items()
+        att_interval_list.append((rule.attribute, rule.preferred))
+        att_interval_list.append((rule.attribute, rule.not_preferred))
+        for att, interval in att_interval_list:
+            cut_set = cut_dict.setdefault(att, set())
+            for cut in interval_cuts(interval):
+                if cut is not None:
+                    cut_set.add(cut)
+    return {att: sorted(cut_dict[att]) for att in cut_dict}
+
+
+def rule_att_set(rule):
+    """
+    Return attributes with intervals in 'rule'
+    (antecedent and preference attributes)
+    """
+    att_set = rule.get_antecedent_att_set()
+    att_set.add(rule.attribute)
+    return att_set
+
+
+def split_rule_cuts(rule, cut_dict):
+    """
+    Split intervals of 'rule' in all cuts of 'cut_dict' (see rule_cuts)
+
+    Return a list of rules, one for each combination of split intervals
+    ('rule' itself when no interval is split)
+    """
+    ant_att_list = sorted(rule.antecedents_dict)
+    interval_lists = [elementary_intervals(rule.antecedents_dict[att],
+                                           cut_dict.get(att, []))
+                      for att in ant_att_list]
+    att_cut_list = cut_dict.get(rule.attribute, [])
+    interval_lists.append(elementary_intervals(rule.preferred,
+                                               att_cut_list))
+    interval_lists.append(elementary_intervals(rule.not_preferred,
+                                               att_cut_list))
+    if all(len(interval_list) == 1 for interval_list in interval_lists):
+        return [rule]
+    new_rules_list = []
+    for interval_tuple in product(*interval_lists):
+        new_rule = rule.copy()
+        for att, interval in zip(ant_att_list, interval_tuple):
+            new_rule.antecedents_dict[att] = interval
+        new_rule.preferred = interval_tuple[-2]
+        new_rule.not_preferred = interval_tuple[-1]
+        new_rules_list.append(new_rule)
+    return new_rules_list
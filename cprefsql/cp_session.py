@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Module with session helpers for plpython functions
+
+The functions receive the global dictionary 'GD' of plpython, so
+compiled theories are kept by backend (connection) between calls
+"""
+
+from hashlib import md5
+from cp_cache import LRUCache
+from cp_theory import CPTheory
+
+
+# Key of theory cache in 'GD'
+THEORY_CACHE_KEY = 'cprefsql_theory_cache'
+# Maximum number of compiled theories by session
+THEORY_CACHE_SIZE = 32
+# Maximum number of dominance tests cached by each theory
+DOMINANCE_CACHE_SIZE = 100000
+# Number of tuples fetched by cursor when all tuples are read
+CURSOR_BATCH_SIZE = 1000
+
+
+def rules_version(preference_rules):
+    """
+    Return a version (hash) of 'preference_rules' string
+    """
+    return md5(preference_rules).hexdigest()
+
+
+def theory_cache(gd, cache_size=THEORY_CACHE_SIZE):
+    """
+    Return theory cache stored in 'gd' (it is created if necessary)
+    """
+    if THEORY_CACHE_KEY not in gd:
+        gd[THEORY_CACHE_KEY] = LRUCache(cache_size)
+    return gd[THEORY_CACHE_KEY]
+
+
+def session_theory(gd, preference_name, preference_rules,
+                   theory_string=None):
+    """
+    Return the compiled CPTheory of 'preference_name'
+
+    The theory is built only if it is not in cache or
+    if stored rules were changed (by another session, for example).
+    When the stored compiled theory 'theory_string' is available,
+    it is loaded instead of compiling 'preference_rules'
+    """
+    cache = theory_cache(gd)
+    version = rules_version(preference_rules)
+    entry = cache.get(preference_name)
+    # Check if cached theory is up to date
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    if theory_string:
+        cpt = CPTheory.deserialize(theory_string)
+    else:
+        cpt = CPTheory(preference_rules)
+    cpt.enable_dominance_cache(DOMINANCE_CACHE_SIZE)
+    cache.put(preference_name, (version, cpt))
+    return cpt
+
+
+def store_session_theory(gd, preference_name, cpt):
+    """
+    Store an already compiled theory 'cpt' to 'preference_name'
+
+    Previous theory of 'preference_name' is discarded
+    """
+    cache = theory_cache(gd)
+    cpt.enable_dominance_cache(DOMINANCE_CACHE_SIZE)
+    cache.put(preference_name, (rules_version(str(cpt)), cpt))
+
+
+def invalidate_theory(gd, preference_name):
+    """
+    Remove theory of 'preference_name' from session cache
+    """
+    theory_cache(gd).remove(preference_name)
+
+
+def cursor_tuples(cursor, batch_size):
+    """
+    Generate tuples fetched from a plpython 'cursor' in batches of
+    'batch_size' tuples
+
+    Only one batch is kept in memory
+    """
+    while True:
+        batch = cursor.fetch(batch_size)
+        if not batch:
+            break
+        for tup in batch:
+            yield tup
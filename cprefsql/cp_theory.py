@@ -4,12 +4,17 @@
 Module to manipulate contextual preference theories
 """
 
+from ast import literal_eval
 from pyparsing import ParseException
 from cp_parser import CPParser, get_preferences
-from cp_rule import CPRule
+from cp_rule import CPRule, rule_from_tuple, rule_cuts, split_rule_cuts, \
+    rule_att_set
 from cp_graph import CPGraph
-from cp_comparison import CPComparison, str_formula
-from cp_interval import tuple_has_interval
+from cp_comparison import CPComparison, str_formula, comparison_from_tuple, \
+    formula_key
+from cp_interval import tuple_has_interval, value_in_interval, interval_str
+from cp_cache import DominanceCache
+from cp_budget import CompileBudget, BudgetExceeded
 
 
 class CPTheory(object):
@@ -18,47 +23,71 @@ class CPTheory(object):
 
     Attributes:
         rules_list (list): List of preference rules
-        comparisons_list (list): List of comparisons
+        comparisons_list (list): List of comparisons (generated on first
+            use, see comparisons_over)
         antecedent_att_set (set): Set of attributes in antecedent of all rules
         preference_att_set (set): Set of preference attributes of all rules
         indifferent_att_set (set): Set of indifferent attributes of all rules
-        formulas_list (list): List of essential formulas
+        formulas_list (list): List of essential formulas (generated with
+            comparisons)
         consistent (boolean): Flag of theory consistency
+        inconsistency (str): Description of a cycle that makes theory
+            inconsistent (None when theory is consistent)
+        dominance_cache (DominanceCache): Cache of dominance tests
+            (None when disabled)
+        bound_cache (LRUCache): Theory bound to schemas of tuples
+            (see cp_codegen.bind_theory)
+        budget (CompileBudget): Limits and progress of generation of
+            comparisons
+        budget_error (BudgetExceeded): Error of a generation that exceeded
+            budget (None when comparisons were generated)
     """
-    # List of rules
-    rules_list = []
-    # List of comparisons
-    comparisons_list = []
-    # Set of attributes in antecedent of rules
-    antecedent_att_set = set()
-    # Set of attributes with preference
-    preference_att_set = set()
-    # Set of indifferent attributes
-    indifferent_att_set = set()
-    # List of formulas
-    formulas_list = []
-    # Flag of theory consistency
-    consistent = False
-
-    def __init__(self, cprules_string):
+    __slots__ = ('rules_list', '__comparisons_list', 'antecedent_att_set',
+                 'preference_att_set', 'indifferent_att_set',
+                 '__formulas_list', 'consistent', 'inconsistency',
+                 '__comparison_tuples', '__comparisons_dict',
+                 '__interval_dict',
+                 '__rule_index', '__reach_dict', 'dominance_cache',
+                 'bound_cache', 'budget', 'budget_error')
+    # Version of serialization format
+    SERIAL_VERSION = 2
+
+    def __init__(self, cprules_string=None):
         """
         Create a CPTheory from a string with preference rules
+
+        When 'cprules_string' is None an empty theory is created
+        (used to load stored theories). Rules are parsed, split and
+        checked, comparisons are generated only when they are used
         """
         self.rules_list = []
-        self.comparisons_list = []
         self.antecedent_att_set = set()
         self.preference_att_set = set()
         self.indifferent_att_set = set()
-        self.formulas_list = []
+        # Comparisons and formulas of all attributes (None until generated)
+        self.__comparisons_list = None
+        self.__formulas_list = None
+        # Stored comparisons not loaded yet (see deserialize)
+        self.__comparison_tuples = None
+        # Comparisons over subsets of attributes (see comparisons_over)
+        self.__comparisons_dict = {}
         self.consistent = False
+        self.inconsistency = None
+        self.__interval_dict = {}
+        self.__rule_index = {}
+        self.__reach_dict = None
+        self.dominance_cache = None
+        self.bound_cache = None
+        self.budget = CompileBudget()
+        self.budget_error = None
+        if cprules_string is None:
+            return
         parse_result = CPParser.parse(cprules_string)
         for parse_res in parse_result:
             cpr = CPRule(parse_res)
             self.__add_rule(cpr)
         self.__split_rules()
         self.__check_consistency()
-        if self.consistent:
-            self.__build_comparisons()
 
     def __str__(self):
         str_list = [str(r) for r in self.rules_list]
@@ -67,19 +96,156 @@ class CPTheory(object):
     def __len__(self):
         return len(self.rules_list)
 
-    def __del__(self):
-        del self.rules_list[:]
-        del self.rules_list
-        del self.comparisons_list[:]
-        del self.comparisons_list
-        del self.formulas_list[:]
-        del self.formulas_list
-        self.antecedent_att_set.clear()
-        del self.antecedent_att_set
-        self.preference_att_set.clear()
-        del self.preference_att_set
-        self.indifferent_att_set.clear()
-        del self.indifferent_att_set
+    @property
+    def comparisons_list(self):
+        """
+        Comparisons of all attributes (generated on first use)
+        """
+        if self.__comparisons_list is None:
+            if self.__comparison_tuples is not None:
+                self.__comparisons_list = [
+                    comparison_from_tuple(comp_tuple)
+                    for comp_tuple in self.__comparison_tuples]
+                self.__comparison_tuples = None
+            else:
+                self.__formulas_list, self.__comparisons_list = \
+                    self.__generate(self.__theory_att_set())
+        return self.__comparisons_list
+
+    @property
+    def formulas_list(self):
+        """
+        Formulas of all attributes (generated on first use)
+        """
+        if self.__formulas_list is None:
+            self.__formulas_list = \
+                self.__generate(self.__theory_att_set())[0]
+        return self.__formulas_list
+
+    @property
+    def datalog_only(self):
+        """
+        Flag of theory without comparisons, because their generation
+        exceeded budget (dominance is tested by datalog method)
+        """
+        return self.budget_error is not None
+
+    def comparisons_over(self, att_set):
+        """
+        Return comparisons that can be satisfied by tuples with
+        attributes 'att_set'
+
+        Formulas of a comparison must be over attributes of tuples.
+        When 'att_set' has all attributes of theory, comparisons_list is
+        returned. Otherwise, formulas are combined only over attributes
+        of 'att_set' (comparisons are cached by set of attributes)
+        """
+        theory_att_set = self.__theory_att_set()
+        key = frozenset(theory_att_set.intersection(att_set))
+        if key == theory_att_set:
+            return self.comparisons_list
+        if key not in self.__comparisons_dict:
+            self.__comparisons_dict[key] = self.__generate(key)[1]
+        return self.__comparisons_dict[key]
+
+    def __generate(self, att_set):
+        """
+        Return formulas and comparisons over 'att_set' generated inside
+        budget
+
+        When budget is exceeded, empty lists are returned (datalog-only
+        mode) or BudgetExceeded is raised (see CompileBudget.fallback).
+        The error is kept, so generation is not tried again
+        """
+        if self.consistent and self.budget_error is None:
+            self.budget.start(self.__interval_counts(att_set))
+            try:
+                formulas_list = self.__build_formulas(att_set)
+                return formulas_list, self.__build_comparisons(formulas_list)
+            except BudgetExceeded as error:
+                self.budget_error = error
+        if self.budget_error is not None and not self.budget.fallback:
+            raise self.budget_error
+        return [], []
+
+    def __interval_counts(self, att_set):
+        """
+        Return number of intervals in rules of each attribute of 'att_set'
+        """
+        interval_dict = {}
+        for cpr in self.rules_list:
+            for formula in cpr.get_atomic_formulas():
+                for att, interval in formula.items():
+                    if att in att_set:
+                        interval_dict.setdefault(att, set()).add(interval)
+        return {att: len(interval_dict[att]) for att in interval_dict}
+
+    def __theory_att_set(self):
+        """
+        Return antecedent and preference attributes of theory
+        """
+        return self.antecedent_att_set.union(self.preference_att_set)
+
+    def enable_dominance_cache(self, capacity):
+        """
+        Store results of dominance tests in a cache with
+        at most 'capacity' results (None disables the cache)
+        """
+        if capacity is None:
+            self.dominance_cache = None
+        else:
+            self.dominance_cache = DominanceCache(
+                self.antecedent_att_set.union(self.preference_att_set),
+                capacity)
+
+    def serialize(self):
+        """
+        Return the compiled theory in a compact string format
+
+        The string keeps split rules, essential comparisons and
+        attribute sets, so it can be loaded without parsing and
+        comparison generation (see CPTheory.deserialize).
+        Comparisons are generated if they were not used before
+        (datalog-only theories keep error of budget)
+        """
+        comparisons_tuple = tuple(comp.to_tuple()
+                                  for comp in self.comparisons_list)
+        budget_tuple = None
+        if self.budget_error is not None:
+            budget_tuple = (str(self.budget_error),
+                            tuple(self.budget_error.att_list))
+        return repr((self.SERIAL_VERSION,
+                     self.consistent,
+                     tuple(cpr.to_tuple() for cpr in self.rules_list),
+                     comparisons_tuple,
+                     tuple(sorted(self.antecedent_att_set)),
+                     tuple(sorted(self.preference_att_set)),
+                     tuple(sorted(self.indifferent_att_set)),
+                     budget_tuple))
+
+    @classmethod
+    def deserialize(cls, theory_string):
+        """
+        Create a CPTheory from a string generated by CPTheory.serialize()
+
+        Theories of version 1 (without budget error) are loaded too
+        """
+        theory_tuple = literal_eval(theory_string)
+        if theory_tuple[0] not in (1, cls.SERIAL_VERSION):
+            raise ValueError('Invalid version of stored theory')
+        cpt = cls()
+        cpt.consistent = theory_tuple[1]
+        cpt.rules_list = [rule_from_tuple(rule_tuple)
+                          for rule_tuple in theory_tuple[2]]
+        # Comparisons are created only when they are used
+        cpt.__comparison_tuples = theory_tuple[3]
+        cpt.antecedent_att_set = set(theory_tuple[4])
+        cpt.preference_att_set = set(theory_tuple[5])
+        cpt.indifferent_att_set = set(theory_tuple[6])
+        if len(theory_tuple) > 7 and theory_tuple[7] is not None:
+            cpt.budget_error = BudgetExceeded(theory_tuple[7][0],
+                                              list(theory_tuple[7][1]))
+        return cpt
 
     def __rules_over_attribute(self, att):
         """
@@ -102,73 +268,185 @@ class CPTheory(object):
         self.indifferent_att_set = self.indifferent_att_set.union(
                                             rule.indifferent_att_set)
 
-    def __build_formulas(self):
+    def __build_att_sets(self):
         """
-        Generate a list of formulas combining all intervals of attributes
+        Build sets of antecedent, preference and indifferent attributes
+        from 'rules_list'
+        """
+        self.antecedent_att_set = set()
+        self.preference_att_set = set()
+        self.indifferent_att_set = set()
+        for cpr in self.rules_list:
+            self.antecedent_att_set.update(cpr.get_antecedent_att_set())
+            self.preference_att_set.add(cpr.attribute)
+            self.indifferent_att_set.update(cpr.indifferent_att_set)
+
+    def add_rules(self, cprules_string):
+        """
+        Add rules of string 'cprules_string' to theory and
+        return consistency flag
+
+        Rules already in theory are split again only when they have
+        intervals over attributes where new rules have new limits.
+        When theory was consistent, only local consistency of changed
+        preference attributes is checked
+        """
+        new_rules_list = [CPRule(parse_res)
+                          for parse_res in CPParser.parse(cprules_string)]
+        cut_dict = rule_cuts(self.rules_list)
+        new_cut_dict = rule_cuts(new_rules_list)
+        # Attributes with new limits
+        changed_att_set = set()
+        for att in new_cut_dict:
+            cut_set = set(cut_dict.get(att, []))
+            if not cut_set.issuperset(new_cut_dict[att]):
+                changed_att_set.add(att)
+                cut_dict[att] = sorted(cut_set.union(new_cut_dict[att]))
+        rules_list = []
+        # Preference attributes of changed rules
+        local_att_set = set(cpr.attribute for cpr in new_rules_list)
+        for cpr in self.rules_list:
+            if rule_att_set(cpr).isdisjoint(changed_att_set):
+                rules_list.append(cpr)
+            else:
+                rules_list += split_rule_cuts(cpr, cut_dict)
+                local_att_set.add(cpr.attribute)
+        for cpr in new_rules_list:
+            rules_list += split_rule_cuts(cpr, cut_dict)
+        self.rules_list = rules_list
+        if not self.consistent:
+            local_att_set = None
+        self.__update(local_att_set)
+        return self.consistent
+
+    def drop_rules(self, cprules_string):
+        """
+        Remove rules of string 'cprules_string' from theory and
+        return consistency flag
+
+        Rules are split like rules in theory and each split rule is
+        removed (rules are not merged again). When theory was consistent,
+        it is still consistent and consistency is not checked.
+        Raise ValueError if some rule is not in theory
+        """
+        cut_dict = rule_cuts(self.rules_list)
+        rules_list = self.rules_list[:]
+        for parse_res in CPParser.parse(cprules_string):
+            for cpr in split_rule_cuts(CPRule(parse_res), cut_dict):
+                rule_tuple = cpr.to_tuple()
+                for index, theory_rule in enumerate(rules_list):
+                    if theory_rule.to_tuple() == rule_tuple:
+                        del rules_list[index]
+                        break
+                else:
+                    raise ValueError('Rule is not in theory: ' + str(cpr))
+        self.rules_list = rules_list
+        if self.consistent:
+            self.__update(set())
+        else:
+            self.__update(None)
+        return self.consistent
+
+    def __update(self, local_att_set):
+        """
+        Update theory after a change in 'rules_list'
+
+        Local consistency is checked only for attributes in
+        'local_att_set' (all attributes when it is None).
+        Comparisons are generated again from split rules on next use
+        """
+        self.__build_att_sets()
+        # Structures built from rules
+        self.__interval_dict = {}
+        self.__rule_index = {}
+        self.__reach_dict = None
+        self.bound_cache = None
+        if self.dominance_cache is not None:
+            self.enable_dominance_cache(self.dominance_cache.capacity)
+        self.inconsistency = None
+        self.consistent = self.__global_consistency() \
+            and self.__local_consistency(local_att_set)
+        self.__comparisons_list = None
+        self.__formulas_list = None
+        self.__comparison_tuples = None
+        self.__comparisons_dict = {}
+        self.budget_error = None
+
+    def __build_formulas(self, att_set):
+        """
+        Return a list of formulas combining all intervals of attributes
+        in 'att_set'
+
+        Formulas are deduplicated by their keys (see formula_key) and
+        counted by budget
         """
         # Get atomic formulas in all rules
-        self.formulas_list = []
+        formulas_list = []
         atomic_formulas_list = []
+        key_set = set()
         for cpr in self.rules_list:
             for formula in cpr.get_atomic_formulas():
-                if formula not in self.formulas_list:
-                    self.formulas_list.append(formula)
+                if formula.keys()[0] not in att_set:
+                    continue
+                key = formula_key(formula)
+                if key not in key_set:
+                    key_set.add(key)
+                    formulas_list.append(formula)
                     atomic_formulas_list.append(formula)
+                    self.budget.add_formula()
         # Combined formulas
-        att_set = self.antecedent_att_set.union(self.preference_att_set)
         for att in att_set:
             new_formulas_list = []
-            for formula in self.formulas_list:
+            for formula in self.budget.iter_steps(formulas_list):
                 for atomic in atomic_formulas_list:
                     if att not in formula \
                     and att in atomic:
                         new_formula = formula.copy()
                         new_formula[att] = atomic[att]
-                        if new_formula not in self.formulas_list \
-                        and new_formula not in new_formulas_list:
+                        key = formula_key(new_formula)
+                        if key not in key_set:
+                            key_set.add(key)
                             new_formulas_list.append(new_formula)
-            self.formulas_list += new_formulas_list
+                            self.budget.add_formula()
+            formulas_list += new_formulas_list
+        return formulas_list
 
-    def __remove_not_essential_comp(self):
+    def __build_comparisons(self, formulas_list):
         """
-        Remove no essential comparisons of 'comparisons_list'
-        """
-        essential_comp_list = []
-        for comp in self.comparisons_list:
-            if comp.is_essential(self.comparisons_list):
-                essential_comp_list.append(comp)
-        self.comparisons_list = essential_comp_list[:]
-
-    def __build_comparisons(self):
-        """
-        Generate all comparisons that can be realized by cp-rules
+        Return all essential comparisons between formulas of
+        'formulas_list' that can be realized by cp-rules
         Comparisons are in format:
             (preferred) BETTER (not_preferred) [indifferent]
+        Generated comparisons are counted by budget
         """
-        # Generate all formulas
-        self.__build_formulas()
+        comparisons_list = []
+        # Keys of generated comparisons (see CPComparison.key)
+        key_set = set()
         # Generate direct comparisons
-        for formula1 in self.formulas_list:
-            for formula2 in self.formulas_list:
-                if formula1 != formula2:
-                    for cpr in self.rules_list:
-                        if cpr.formula_dominates(formula1, formula2):
-                            pref_indiff_set = \
-                                cpr.indifferent_att_set.difference(
-                                               set(formula1.keys()))
-                            not_pref_indiff_set = \
-                                cpr.indifferent_att_set.difference(
-                                               set(formula2.keys()))
-                            new_comp = CPComparison(formula1, formula2,
-                                                      pref_indiff_set,
-                                                      not_pref_indiff_set)
-                            if new_comp not in self.comparisons_list:
-                                self.comparisons_list.append(new_comp)
+        candidate_list = self.__dominance_candidates(formulas_list)
+        for index1, index2, cpr in self.budget.iter_steps(candidate_list):
+            formula1 = formulas_list[index1]
+            formula2 = formulas_list[index2]
+            if cpr.formula_dominates(formula1, formula2):
+                pref_indiff_set = \
+                    cpr.indifferent_att_set.difference(
+                                   set(formula1.keys()))
+                not_pref_indiff_set = \
+                    cpr.indifferent_att_set.difference(
+                                   set(formula2.keys()))
+                new_comp = CPComparison(formula1, formula2,
+                                          pref_indiff_set,
+                                          not_pref_indiff_set)
+                key = new_comp.key()
+                if key not in key_set:
+                    key_set.add(key)
+                    comparisons_list.append(new_comp)
+                    self.budget.add_comparison()
         # Generate indirect comparisons
-        build_comp_list = self.comparisons_list[:]
+        build_comp_list = comparisons_list[:]
         while build_comp_list != []:
             new_comp_list = []
-            for comp in build_comp_list:
+            for comp in self.budget.iter_steps(build_comp_list):
                 for cpr in self.rules_list:
                     new_formula = cpr.datalog_formula(
                         comp.not_pref_formula_dict)
@@ -177,17 +455,49 @@ class CPTheory(object):
                                                   new_formula,
                                                   comp.pref_indif_set,
                                                   cpr.indifferent_att_set)
-                        if new_comp not in self.comparisons_list \
-                        and new_comp not in new_comp_list:
+                        key = new_comp.key()
+                        if key not in key_set:
+                            key_set.add(key)
                             new_comp_list.append(new_comp)
+                            self.budget.add_comparison()
 #             if new_comp_list != []:
-            self.comparisons_list += new_comp_list
+            comparisons_list += new_comp_list
             build_comp_list = new_comp_list[:]
 #             else:
 #                 build_comp_list = []
         # Remove not essential formulas
-        self.__remove_not_essential_comp()
-        self.comparisons_list.sort()
+        comparisons_list = essential_comparisons(comparisons_list,
+                                                 self.budget)
+        comparisons_list.sort()
+        return comparisons_list
+
+    def __dominance_candidates(self, formulas_list):
+        """
+        Return list of triples (index1, index2, rule) where formula of
+        'index1' in 'formulas_list' has the preferred interval of rule and
+        formula of 'index2' has the not preferred interval (and they are
+        different)
+
+        Triples are in order of formulas and rules, only these pairs of
+        formulas can be compared by rule (see CPRule.formula_dominates)
+        """
+        # Indexes of formulas by attribute and interval
+        index_dict = {}
+        for index, formula in enumerate(formulas_list):
+            for att in formula:
+                index_dict.setdefault((att, formula[att]), []).append(index)
+        candidate_list = []
+        for index_rule, cpr in enumerate(self.rules_list):
+            pref_list = index_dict.get((cpr.attribute, cpr.preferred), [])
+            not_pref_list = index_dict.get((cpr.attribute, cpr.not_preferred),
+                                           [])
+            for index1 in pref_list:
+                for index2 in not_pref_list:
+                    if index1 != index2:
+                        candidate_list.append((index1, index2, index_rule))
+        candidate_list.sort()
+        return [(index1, index2, self.rules_list[index_rule])
+                for index1, index2, index_rule in candidate_list]
 
     def __split_rules(self):
         """
@@ -198,48 +508,31 @@ class CPTheory(object):
             - Three three new intervals: (1 < A <= 2) and (2 < A < 9) and
                                         (9 <= A < 10)
         The original number of rules can be increased
-        """
-        while True:
-            # List of new rules
-            new_rules_list = []
-            # Get pair of rules
-            for cpr1 in self.rules_list:
-                for cpr2 in self.rules_list:
-                    # 'new_rules_list' is rules originated by
-                    # 'cpr2' with split in intervals
-                    new_rules_list = cpr1.split_rule(cpr2)
-                    # Check if there was split in 'cpr2' intervals
-                    if new_rules_list:
-                        # Remove original rule
-                        self.rules_list.remove(cpr2)
-                        break
-                # Restart iteration
-                if new_rules_list:
-                    break
-            # Check if there was split in intervals
-            if new_rules_list:
-                # Add new rules
-                self.rules_list += new_rules_list
-            else:
-                # Stop, when there wasn't split
-                break
 
-    def __global_consistency(self):
+        All limits of intervals of each attribute are collected once and
+        each interval is split in all limits inside it (see rule_cuts)
         """
-        Check global consistency of theory
+        cut_dict = rule_cuts(self.rules_list)
+        new_rules_list = []
+        for cpr in self.rules_list:
+            new_rules_list += split_rule_cuts(cpr, cut_dict)
+        self.rules_list = new_rules_list
 
+    def attribute_graph(self):
+        """
         Build a graph with edges ('A', 'P') and ('P', 'C')
         Where, in a rule:
             'A' is a attribute in antecedent of rule
             'P' is the attribute in the preference specification
             'C' is a indifferent attribute
         All rules are considered
-        If builded graph is acyclic, then theory is globally consistent
         """
         # Initialize graph
         graph = CPGraph()
         # For each rule
         for cpr in self.rules_list:
+            # Preference attribute is a vertex even without edges
+            graph.add_vertex(cpr.attribute)
             # For each antecedent in 'cpr' rule
             for ant in cpr.antecedents_dict:
                 # Add edge ('A', 'P')
@@ -248,28 +541,54 @@ class CPTheory(object):
             for cet in cpr.indifferent_att_set:
                 # Add edge ('P', 'C')
                 graph.add_edge(cpr.attribute, cet)
+        return graph
+
+    def __global_consistency(self):
+        """
+        Check global consistency of theory
+
+        If the graph built by attribute_graph() is acyclic,
+        then theory is globally consistent
+        """
         # Check if graph is acyclic
-        if graph.is_acyclic():
+        cycle_list = self.attribute_graph().find_cycle()
+        if cycle_list is None:
             return True
-        else:
-            return False
+        self.inconsistency = 'Cycle between attributes: ' + \
+            ' -> '.join(str(att) for att in cycle_list)
+        return False
 
-    def __local_consistency(self):
+    def __local_consistency(self, att_set=None):
         """
         Check local consistency
 
         Check if there is a cycle like A better B and B better A
+        (only preferences over 'att_set' when it is not None)
         """
+        if att_set is None:
+            att_set = self.preference_att_set
         # For each consequent attribute
-        for att in self.preference_att_set:
-            # Get rules where preferences are over 'att'
-            rules_att_list = self.__rules_over_attribute(att)
-            # Get all possible lists of antecedents in 'rules_att_list'
+        for att in self.preference_att_set.intersection(att_set):
+            # Get rules where preferences are over 'att' that can be
+            # in a cycle (see cycle_rules)
+            rules_att_list = cycle_rules(self.__rules_over_attribute(att))
+            # Get maximal lists of compatible antecedents
+            # in 'rules_att_list'
             ant_lists = build_ant_lists(rules_att_list)
             for ant_list in ant_lists:
                 rules_list = rules_over_ant_list(rules_att_list, ant_list)
                 graph = graph_local_consistency(rules_list)
-                if not graph.is_acyclic():
+                cycle_list = graph.find_cycle()
+                if cycle_list is not None:
+                    self.inconsistency = \
+                        'Cycle between preferences: ' + \
+                        ' > '.join(interval_str(att, interval)
+                                   for interval in cycle_list)
+                    context_list = [str_formula(ant) for ant in ant_list
+                                    if ant != {}]
+                    if context_list != []:
+                        self.inconsistency += ' in context ' + \
+                            ' AND '.join(context_list)
                     return False
         return True
 
@@ -285,38 +604,168 @@ class CPTheory(object):
             self.consistent = False
             return False
 
+    def __build_datalog_index(self):
+        """
+        Build structures used by datalog method:
+            - Dictionary of intervals of each attribute in rules
+            - Index of rules by preference attribute and preferred interval
+            - Dictionary of intervals reached from each preferred interval
+              by rules over a preference attribute
+              (antecedents are not considered)
+        """
+        self.__interval_dict = {}
+        self.__rule_index = {}
+        self.__reach_dict = {}
+        for cpr in self.rules_list:
+            att_interval_list = cpr.antecedents_dict.items()
+            att_interval_list.append((cpr.attribute, cpr.preferred))
+            for att, interval in att_interval_list:
+                interval_set = self.__interval_dict.setdefault(att, set())
+                interval_set.add(interval)
+            index_key = (cpr.attribute, cpr.preferred)
+            self.__rule_index.setdefault(index_key, []).append(cpr)
+        for att in self.preference_att_set:
+            graph = CPGraph()
+            for cpr in self.__rules_over_attribute(att):
+                graph.add_edge(cpr.preferred, cpr.not_preferred)
+            self.__reach_dict[att] = {}
+            for interval in graph.vertices():
+                self.__reach_dict[att][interval] = \
+                    graph.reachable_set(interval)
+
+    def __tuple_intervals(self, tup):
+        """
+        Return a dictionary with set of rule intervals
+        satisfied by each attribute of 'tup'
+        """
+        intervals_dict = {}
+        for att in self.__interval_dict:
+            if att in tup:
+                intervals_dict[att] = set(
+                    interval for interval in self.__interval_dict[att]
+                    if tuple_has_interval(tup, att, interval))
+        return intervals_dict
+
+    def datalog_successors(self, tup):
+        """
+        Return list of pairs (rule, new tuple) for each rule satisfied
+        by 'tup' and the tuple generated by rule
+
+        Only rules indexed by intervals of 'tup' are checked
+        """
+        if self.__reach_dict is None:
+            self.__build_datalog_index()
+        intervals_dict = self.__tuple_intervals(tup)
+        successors_list = []
+        for att in self.preference_att_set:
+            if att not in intervals_dict:
+                continue
+            for interval in intervals_dict[att]:
+                for rule in self.__rule_index.get((att, interval), []):
+                    # Check antecedent using intervals of 'tup'
+                    for ant in rule.antecedents_dict:
+                        if ant in intervals_dict \
+                        and rule.antecedents_dict[ant] \
+                        not in intervals_dict[ant]:
+                            break
+                    else:
+                        successors_list.append((rule,
+                                                rule.switch_tuple(tup)))
+        return successors_list
+
+    def __can_reach_goal(self, datalog_tup, goal_tup):
+        """
+        Check if 'goal_tup' still can be reached from 'datalog_tup'
+
+        An attribute that is not indifferent in any rule can not be
+        removed, so its value must reach the value in 'goal_tup'
+        """
+        for att in datalog_tup:
+            if att in self.indifferent_att_set \
+            or tuple_has_interval(goal_tup, att, datalog_tup[att]):
+                continue
+            # Value can not be changed
+            if att not in self.__reach_dict or att not in goal_tup:
+                return False
+            # Check if some interval reached by rules has goal value
+            value = datalog_tup[att]
+            for interval in self.__reach_dict[att]:
+                if (interval == value or (type(value) is not tuple and
+                                          value_in_interval(value, interval))) \
+                and any(value_in_interval(goal_tup[att], reached)
+                        for reached in self.__reach_dict[att][interval]):
+                    break
+            else:
+                return False
+        return True
+
     def datalog_dominates(self, tuple1, tuple2):
         """
         Returns True if 'tuple1' dominates (is preferred to) tuple2
         according to theory (datalog method)
         """
-        if tuple1 != tuple2:
-            # Initialize datalog list
-            # List of tuples to be processed
-            process_tup_list = [tuple1]
-            # List of tuples already tested
-            tested_tup_list = []
-            while process_tup_list != []:
-                # List of new tuples generated by datalog
-                new_tup_list = []
-                # Generate new tuples to datalog
-                for tup in process_tup_list:
-                    for rule in self.rules_list:
-                        new_tup = rule.datalog_tuple(tup)
-                        if new_tup is not None \
-                        and new_tup not in tested_tup_list:
-                            new_tup_list.append(new_tup)
-                            # Check if goal was reached
-                            if datalog_goal(new_tup, tuple2):
-                                return True
-                process_tup_list = new_tup_list[:]
-                tested_tup_list += new_tup_list
+        if self.dominance_cache is None:
+            return self.__datalog_dominates(tuple1, tuple2)
+        return self.dominance_cache.dominates('datalog',
+                                              self.__datalog_dominates,
+                                              tuple1, tuple2)
+
+    def __datalog_dominates(self, tuple1, tuple2):
+        """
+        Datalog method without cache
+
+        Generated tuples are stored in a set and tuples that can not
+        reach 'tuple2' are not expanded. Rules are got by index
+        (see datalog_successors)
+        """
+        if tuple1 == tuple2:
+            return False
+        if self.__reach_dict is None:
+            self.__build_datalog_index()
+        if not self.__can_reach_goal(tuple1, tuple2):
+            return False
+        # Initialize datalog list
+        # List of tuples to be processed
+        process_tup_list = [tuple1]
+        # Set of tuples already tested
+        tested_tup_set = set()
+        while process_tup_list != []:
+            # List of new tuples generated by datalog
+            new_tup_list = []
+            # Generate new tuples to datalog
+            for tup in process_tup_list:
+                for _, new_tup in self.datalog_successors(tup):
+                    tup_key = datalog_key(new_tup)
+                    if tup_key in tested_tup_set:
+                        continue
+                    tested_tup_set.add(tup_key)
+                    # Check if goal was reached
+                    if datalog_goal(new_tup, tuple2):
+                        return True
+                    if self.__can_reach_goal(new_tup, tuple2):
+                        new_tup_list.append(new_tup)
+            process_tup_list = new_tup_list
         return False
 
     def optimized_dominates(self, tuple1, tuple2):
         """
         Returns True if 'tuple1' dominates (is preferred to) tuple2
         according to theory
+
+        Datalog method is used by datalog-only theories
+        """
+        # Generation of comparisons can fall back to datalog-only mode
+        if len(self.comparisons_list) == 0 and self.datalog_only:
+            return self.datalog_dominates(tuple1, tuple2)
+        if self.dominance_cache is None:
+            return self.__optimized_dominates(tuple1, tuple2)
+        return self.dominance_cache.dominates('optimized',
+                                              self.__optimized_dominates,
+                                              tuple1, tuple2)
+
+    def __optimized_dominates(self, tuple1, tuple2):
+        """
+        Comparisons method without cache
         """
         # Check if 'tuple1' is not equal 'tuple2'
         if tuple1 != tuple2:
@@ -348,6 +797,34 @@ class CPTheory(object):
         return '\n'.join(comparison_list_str)
 
 
+def essential_comparisons(comparisons_list, budget=None):
+    """
+    Return essential comparisons of 'comparisons_list'
+    (see CPComparison.is_essential)
+
+    Each test is counted as a step of 'budget', if it is given
+    """
+    essential_list = []
+    for comp in comparisons_list:
+        if budget is not None:
+            budget.step(len(comparisons_list))
+        if comp.is_essential(comparisons_list):
+            essential_list.append(comp)
+    return essential_list
+
+
+def get_theory(preference_rules):
+    """
+    Return a CPTheory to 'preference_rules'
+
+    'preference_rules' can be a string with preference rules or
+    an already compiled CPTheory (like theories cached by session)
+    """
+    if isinstance(preference_rules, CPTheory):
+        return preference_rules
+    return CPTheory(preference_rules)
+
+
 def antecedent_intervals_dict(rules_list):
     """
     Return a dictionary where keys are attributes in antecedent of rules
@@ -392,6 +869,17 @@ def graph_local_consistency(rules_list):
     return graph
 
 
+def datalog_key(datalog_tup):
+    """
+    Return a hashable key of a tuple generated by datalog method
+
+    All tuples generated from a same tuple have the original values or
+    intervals set by rules, so original values are replaced by None
+    """
+    return frozenset((att, value if type(value) is tuple else None)
+                     for att, value in datalog_tup.iteritems())
+
+
 def datalog_goal(datalog_tup, goal_tup):
     """
     Check if some tuple in 'datalog_tup' is the 'goal_tup'
@@ -404,64 +892,98 @@ def datalog_goal(datalog_tup, goal_tup):
     return True
 
 
+def cycle_rules(rules_list):
+    """
+    Return rules of 'rules_list' that can be in a cycle of
+    preferences in some context
+
+    A cycle of rules valid in a context is a cycle of the graph of all
+    rules, so its edges are inside a strongly connected component
+    """
+    component_dict = graph_local_consistency(rules_list).component_dict()
+    return [cpr for cpr in rules_list
+            if component_dict[cpr.preferred] ==
+            component_dict[cpr.not_preferred]]
+
+
+def compatible_antecedents(ant1, ant2):
+    """
+    Check if antecedents 'ant1' and 'ant2' can be satisfied together
+    (common attributes have the same interval)
+
+    Intervals of split rules are equal or disjoint
+    """
+    for att in ant1:
+        if att in ant2 and ant1[att] != ant2[att]:
+            return False
+    return True
+
+
 def build_ant_lists(rules_list):
     """
     Build a list of combined antecedents
     A combined antecedent is a list of antecedent
+
+    Only maximal combinations are built: distinct antecedents are vertices
+    of a compatibility graph and combinations are its maximal cliques
+    (see maximal_cliques). Rules valid in any context are a subset of
+    rules of some maximal combination
     """
-    ant_lists = []
-    # Individual antecedents
+    ant_list = []
+    key_set = set()
     for rule in rules_list:
-        ant_list = [rule.antecedents_dict]
-        if ant_list not in ant_lists:
-            ant_lists.append(ant_list)
-    # Combined antecedents
-    change = True
-    while change == True:
-        change = False
-        new_ant_list = []
-        for ant_list1 in ant_lists:
-            for ant_list2 in ant_lists:
-                if ant_list1 != ant_list2:
-                    new_ant_list = combine_ant_lists(ant_list1, ant_list2)
-                    new_ant_list.sort()
-                    if new_ant_list != [] \
-                    and new_ant_list not in ant_lists \
-                    and new_ant_list not in new_ant_list:
-                        new_ant_list.append(new_ant_list)
-                        change = True
-        ant_lists += new_ant_list
-    return ant_lists
-
-
-def combine_ant_lists(ant_list1, ant_list2):
+        key = formula_key(rule.antecedents_dict)
+        if key not in key_set:
+            key_set.add(key)
+            ant_list.append(rule.antecedents_dict)
+    # Compatible antecedents of each antecedent
+    neighbor_lists = [set() for _ in ant_list]
+    for index1, ant1 in enumerate(ant_list):
+        for index2 in range(index1 + 1, len(ant_list)):
+            if compatible_antecedents(ant1, ant_list[index2]):
+                neighbor_lists[index1].add(index2)
+                neighbor_lists[index2].add(index1)
+    return [[ant_list[index] for index in sorted(clique)]
+            for clique in maximal_cliques(neighbor_lists)]
+
+
+def maximal_cliques(neighbor_lists):
     """
-    Combine two combined antecedents
-    If combination could not be done return []
+    Generate maximal cliques (sets of vertices) of a graph where
+    'neighbor_lists' has the set of neighbors of each vertex
+
+    Bron-Kerbosch algorithm with pivot: candidates adjacent to the pivot
+    are not expanded from current clique, since every maximal clique
+    with them has the pivot or another not adjacent candidate
     """
-    for ant1 in ant_list1:
-        for ant2 in ant_list2:
-            for att in ant1:
-                if att in ant2 \
-                and ant1[att] != ant2[att]:
-                    return []
-    new_comb = ant_list1[:]
-    for ant in ant_list2:
-        if ant not in new_comb:
-            new_comb.append(ant)
-    return new_comb
+    # Stack of (clique, candidates, excluded vertices)
+    stack = [(set(), set(range(len(neighbor_lists))), set())]
+    while stack != []:
+        clique, candidate_set, excluded_set = stack.pop()
+        if not candidate_set:
+            if not excluded_set:
+                yield clique
+            continue
+        # Pivot has most neighbors in candidates
+        pivot = max(candidate_set.union(excluded_set),
+                    key=lambda vertex: len(candidate_set &
+                                           neighbor_lists[vertex]))
+        for vertex in list(candidate_set - neighbor_lists[pivot]):
+            neighbor_set = neighbor_lists[vertex]
+            stack.append((clique | set([vertex]),
+                          candidate_set & neighbor_set,
+                          excluded_set & neighbor_set))
+            candidate_set.remove(vertex)
+            excluded_set.add(vertex)
 
 
 def rules_over_ant_list(rules_list, ant_list):
     """
     Return rules of 'rules_att_list' that have some antecedent in 'ant_list'
     """
-    valid_rules_list = []
-    for rule in rules_list:
-        for ant in ant_list:
-            if rule.antecedents_dict == ant:
-                valid_rules_list.append(rule)
-    return valid_rules_list
+    key_set = set(formula_key(ant) for ant in ant_list)
+    return [rule for rule in rules_list
+            if formula_key(rule.antecedents_dict) in key_set]
 
 
 ############################################################################
@@ -3,60 +3,132 @@
 Module to compute the best tuples according to preferences
 """
 
-from cp_theory import CPTheory
+from array import array
+from cp_theory import get_theory
 
 
 def mostk_preferred(preference_rules, k, tuples_list):
     """Return dominant tuples from 'tuples_list'
-    according to 'preference_rules'"""
+    according to 'preference_rules'
+
+    Dominance relation is computed once and levels are obtained removing
+    non dominated tuples, level by level, until 'k' tuples are ready.
+    A tuple dominated by at least 'k' tuples is discarded (all its
+    dominators are in lower levels) and it is not compared anymore"""
+    return list(iter_mostk_preferred(preference_rules, k, tuples_list))
+
+
+def iter_mostk_preferred(preference_rules, k, tuples_list):
+    """Generate dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Same as mostk_preferred, but tuples are generated level by level"""
 
     # Create a cp-theory to compare tuples
-    cpt = CPTheory(preference_rules)
-
-    # Suppose level 0 to all tuples
-    level = {key: 0 for key in range(len(tuples_list))}
-
-    # TODO: Can be improved: computing level 0, follows level 1, so on
-
-    # While happens change in levels
-    change = True
-    max_level = 0
-    while change:
-        change = False
-        # Compare pairs of tuples
-        # Outer loop for 'tup_processed'
-        for idx_processed, tup_processed in enumerate(tuples_list):
-            # Inner loop for 'tup_compared'
-            for idx_compared in range(idx_processed + 1, len(tuples_list)):
-                tup_compared = tuples_list[idx_compared]
-                # Update levels, if it was necessary
-                if cpt.datalog_dominates(tup_processed, tup_compared):
-                    if level[idx_compared] < level[idx_processed] + 1:
-                        level[idx_compared] = level[idx_processed] + 1
-                        max_level = max(max_level, level[idx_compared])
-                        change = True
-                if cpt.datalog_dominates(tup_compared, tup_processed):
-                    if level[idx_processed] < level[idx_compared] + 1:
-                        level[idx_processed] = level[idx_compared] + 1
-                        max_level = max(max_level, level[idx_processed])
-                        change = True
-    # Create a list of lists, one list for each level
-    level_list = [[] for num_level in range(max_level + 1)]
-
-    # Place tuples in correct level list
-    for index, tup in enumerate(tuples_list):
-        num_level = level[index]
-        level_list[num_level].append(tup)
-
-    result = []
-    current_level = 0
+    cpt = get_theory(preference_rules)
+
+    # Number of dominators and list of dominated tuples of each tuple
+    num_dominators_list = array('i', [0]) * len(tuples_list)
+    dominated_lists = [[] for _ in tuples_list]
+
+    # Compare pairs of tuples
+    # Outer loop for 'tup_processed'
+    for idx_processed, tup_processed in enumerate(tuples_list):
+        # Inner loop for 'tup_compared'
+        for idx_compared in range(idx_processed + 1, len(tuples_list)):
+            # Check if 'tup_processed' was discarded
+            if num_dominators_list[idx_processed] >= k:
+                break
+            # Check if 'tup_compared' was discarded
+            if num_dominators_list[idx_compared] >= k:
+                continue
+            tup_compared = tuples_list[idx_compared]
+            if cpt.datalog_dominates(tup_processed, tup_compared):
+                dominated_lists[idx_processed].append(idx_compared)
+                num_dominators_list[idx_compared] += 1
+            elif cpt.datalog_dominates(tup_compared, tup_processed):
+                dominated_lists[idx_compared].append(idx_processed)
+                num_dominators_list[idx_processed] += 1
+
+    # Discarded tuples are not leveled
+    for index, dominated_list in enumerate(dominated_lists):
+        dominated_lists[index] = [index_dominated
+                                  for index_dominated in dominated_list
+                                  if num_dominators_list[index_dominated] < k]
+
+    for tup in iter_levels(tuples_list, k, num_dominators_list,
+                           dominated_lists):
+        yield tup
+
+
+def peel_levels(tuples_list, k, num_dominators_list, dominated_lists):
+    """Return first 'k' tuples from 'tuples_list' by level
+
+    'num_dominators_list' has the number of dominators of each tuple and
+    'dominated_lists' has indexes of tuples dominated by each tuple.
+    Levels are obtained removing non dominated tuples, level by level.
+    Tuples of a same level are in order of 'tuples_list'"""
+    return list(iter_levels(tuples_list, k, num_dominators_list,
+                            dominated_lists))
+
+
+def iter_levels(tuples_list, k, num_dominators_list, dominated_lists):
+    """Generate first 'k' tuples from 'tuples_list' by level
+    (see peel_levels)
+
+    Tuples of a level are generated before next level is computed"""
+    num_generated = 0
+    # Tuples in level 0
+    level_list = [index for index in range(len(tuples_list))
+                  if num_dominators_list[index] == 0]
     # Return only k tuples required
-    while len(result) < k and len(result) < len(tuples_list):
-        result += level_list[current_level]
-        current_level += 1
+    while num_generated < k and level_list != []:
+        for index in level_list[:k - num_generated]:
+            yield tuples_list[index]
+        num_generated += len(level_list)
+        # Remove current level, tuples without dominators are in next level
+        next_level_list = []
+        for index in level_list:
+            for index_dominated in dominated_lists[index]:
+                num_dominators_list[index_dominated] -= 1
+                if num_dominators_list[index_dominated] == 0:
+                    next_level_list.append(index_dominated)
+        level_list = sorted(next_level_list)
+
+
+def mostk_preferred_stream(preference_rules, k, tuples_iter):
+    """Return dominant tuples from iterable 'tuples_iter'
+    according to 'preference_rules'
+
+    Tuples are read once. A tuple dominated by at least 'k' tuples is
+    discarded, since all its dominators are in lower levels"""
+    return list(iter_mostk_preferred_stream(preference_rules, k, tuples_iter))
+
 
-    if len(result) > k:
-        result = result[:k]
+def iter_mostk_preferred_stream(preference_rules, k, tuples_iter):
+    """Generate dominant tuples from iterable 'tuples_iter'
+    according to 'preference_rules'
 
-    del cpt
-    return result
+    Same as mostk_preferred_stream, but levels of remaining candidates
+    are generated level by level"""
+    cpt = get_theory(preference_rules)
+    # Candidate tuples and number of known dominators of each one
+    candidate_list = []
+    for tup in tuples_iter:
+        num_dominators = 0
+        for candidate in candidate_list:
+            if num_dominators >= k:
+                break
+            if cpt.datalog_dominates(candidate[0], tup):
+                num_dominators += 1
+            elif cpt.datalog_dominates(tup, candidate[0]):
+                candidate[1] += 1
+        # Remove candidates dominated by 'k' tuples
+        candidate_list = [candidate for candidate in candidate_list
+                          if candidate[1] < k]
+        if num_dominators < k:
+            candidate_list.append([tup, num_dominators])
+    # Compute levels of remaining candidates
+    for tup in iter_mostk_preferred(cpt, k, [candidate[0] for candidate
+                                             in candidate_list]):
+        yield tup
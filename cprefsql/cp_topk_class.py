@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Module to compute the top k tuples according to preferences
+Algorithms optimized using classes of intervals
+"""
+
+from array import array
+from cp_theory import get_theory
+from cp_topk import mostk_preferred, peel_levels
+from cp_class import CPClassifier, class_dominators
+
+
+def mostk_preferred_class(preference_rules, k, tuples_list):
+    """Return dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Dominance is computed for pairs of classes instead of pairs of tuples"""
+    cpt = get_theory(preference_rules)
+    classifier = CPClassifier(cpt)
+    try:
+        class_list = classifier.partition(tuples_list)
+    except TypeError:
+        # Some value can not be used as key
+        return mostk_preferred(cpt, k, tuples_list)
+    # Number of dominators and dominated tuples of each tuple
+    num_dominators_list = array('i', [0]) * len(tuples_list)
+    dominated_lists = [[] for _ in tuples_list]
+    for class_tup2, index_list2 in class_list:
+        for class_tup1, index_list1 in class_list:
+            requirement_list = classifier.dominance(class_tup1, class_tup2)
+            if requirement_list == []:
+                continue
+            dominators_dict = class_dominators(tuples_list, index_list1,
+                                               index_list2, requirement_list)
+            for index2 in dominators_dict:
+                num_dominators_list[index2] += len(dominators_dict[index2])
+                for index1 in dominators_dict[index2]:
+                    dominated_lists[index1].append(index2)
+    return peel_levels(tuples_list, k, num_dominators_list, dominated_lists)
@@ -4,113 +4,140 @@ Module to compute the top k tuples according to preferences
 Algorithms optimized using preference partition method
 """
 
-from cp_theory import CPTheory
-from cp_most_preferred_partition import get_tuple_id
+from array import array
+from cp_theory import get_theory
+from cp_topk import iter_mostk_preferred
+from cp_codegen import bind_tuple
 
 
-def buildk_partitions(result_list, attributes_set):
-    """Build a partition set over tuples based on 'attribute_set'
+def comparison_partitions(tuples_list, bound_comparison):
+    """Build partitions of 'tuples_list' according to 'bound_comparison'
+    (see cp_codegen.BoundComparison)
 
-    For each value combination of attributes 'attributes_set',
-    a partition is created"""
+    Return a list with a pair for each partition: indexes of preferred
+    tuples and indexes of not preferred tuples (not preferred tuples
+    that are also preferred are not considered dominated)"""
+    preferred = bound_comparison.preferred
+    not_preferred = bound_comparison.not_preferred
+    partition_key = bound_comparison.partition_key
     partitions = {}
-    # Check if 'attribute_set' is empty
-    if len(attributes_set) == 0:
-        partitions[()] = result_list
-    else:
-        for tup_dict in result_list:
-            tup = tup_dict['tuple']
-            # Get an 'id' to 'tup'
-            tup_id = get_tuple_id(tup, attributes_set)
-            # Check if partition already exists
-            if tup_id in partitions:
-                partitions[tup_id].append(tup_dict)
-            else:
-                partitions[tup_id] = [tup_dict]
-    return partitions
+    for index, tup in enumerate(tuples_list):
+        if preferred(tup):
+            partitions.setdefault(partition_key(tup),
+                                  ([], []))[0].append(index)
+        elif not_preferred(tup):
+            partitions.setdefault(partition_key(tup),
+                                  ([], []))[1].append(index)
+    return partitions.values()
 
 
-def bestk_direct(result_list, comparison):
-    """Change levels of tuples in 'result_list' partition
-     according to 'comparison'"""
-    not_preferred_list = []
-    dominated = False
-    for tup_dict in result_list:
-        tup = tup_dict['tuple']
-        # Check if tuple is preferred
-        if comparison.preferred(tup):
-            dominated = True
-        # Check if tuple is incomparable
-        elif comparison.not_preferred(tup):
-            not_preferred_list.append(tup_dict)
-    # Check if some tuple was dominated
-    if dominated:
-        # Update levels of dominated tuples
-        for tup_dict in not_preferred_list:
-            tup_dict['level'] += 1
+def discarded_tuples(partition_list, k, num_tuples):
+    """Return a list of flags of discarded tuples
 
-
-def bestk_partition(result_list, comparisom):
-    """Change levels of tuples in 'result_list' according to 'comparison'"""
-    tup_dict = result_list[0]
-    # Tuple attributes
-    tuples_att_set = set(tup_dict['tuple'].keys())
-    # Attributes of tuples not present in 'comparison'
-    att_set = tuples_att_set.difference(comparisom.preference_att_set())
-    partitions = buildk_partitions(result_list, att_set)
-    # Update levels in each partition
-    for tup_id in partitions:
-        bestk_direct(partitions[tup_id], comparisom)
+    'partition_list' has pairs of indexes of preferred tuples and
+    indexes of not preferred tuples of all comparisons.
+    Preferred tuples of a partition dominate its not preferred tuples,
+    so a tuple is discarded when there are at least 'k' preferred tuples
+    in some partition where it is not preferred. Tuples dominated by a
+    discarded tuple are in higher levels and they are discarded too."""
+    # Lower bound of number of dominators of each tuple
+    num_dominators_list = array('i', [0]) * num_tuples
+    # Partitions where each tuple is preferred
+    preferred_lists = [[] for _ in range(num_tuples)]
+    for preferred_list, not_preferred_list in partition_list:
+        for index in not_preferred_list:
+            num_dominators_list[index] = max(num_dominators_list[index],
+                                             len(preferred_list))
+        for index in preferred_list:
+            preferred_lists[index].append(not_preferred_list)
+    # Discard tuples with 'k' dominators and tuples dominated by them
+    discarded_list = [num_dominators >= k
+                      for num_dominators in num_dominators_list]
+    waiting_list = [index for index in range(num_tuples)
+                    if discarded_list[index]]
+    while waiting_list != []:
+        index = waiting_list.pop()
+        for not_preferred_list in preferred_lists[index]:
+            for index_dominated in not_preferred_list:
+                if not discarded_list[index_dominated]:
+                    discarded_list[index_dominated] = True
+                    waiting_list.append(index_dominated)
+    return discarded_list
 
 
 def mostk_preferred_partition(preference_rules, k, tuples_list):
     """Return dominant tuples from 'tuples_list'
-    according to 'preference_rules'"""
-    # Create a cp-theory to compare tuples
-    cpt = CPTheory(preference_rules)
-    # Temporary list
-    temp_list = []
-    # Build a structure of tuples and their levels
-    for tup in tuples_list:
-        tup_dict = {}
-        tup_dict['level'] = 0
-        tup_dict['tuple'] = tup
-        temp_list.append(tup_dict)
-    # Current level of tuples to be get
-    level = 0
-    # Number of tuples ready
-    num_tuples_ready = 0
-    # List of tuple by level
-    tuples_by_level_dict = {}
-    # Process 'temp_list' until all level will be explored
-    # Or 'k' tuples are ready
-    while len(temp_list) > 0 and num_tuples_ready < k:
-        # Initialize list of tuples in level 'level'
-        tuples_by_level_dict[level] = []
-        # Process comparisons over 'temp_list'
-        for comp in cpt.comparisons_list:
-            bestk_partition(temp_list, comp)
-        # Copy list of 'temp_list'
-        copy_list = [tup_dict for tup_dict in temp_list]
-        temp_list = []
-        # Tuples if level > 'level' (not ready) remain in 'temp_list'
-        for tup_dict in copy_list:
-            # If tuple level = 'level' then tuple is ready
-            if tup_dict['level'] == level:
-                tuples_by_level_dict[level].append(tup_dict['tuple'])
-                num_tuples_ready += 1
-            else:
-                tup_dict['level'] = level + 1
-                temp_list.append(tup_dict)
-        level += 1
+    according to 'preference_rules'
+
+    Partitions of each comparison are built once. A tuple is in current
+    level when no partition where it is not preferred has remaining
+    preferred tuples. After removing a level, only partitions that lost
+    preferred tuples are updated. Tuples dominated by at least 'k' tuples
+    are discarded before (see discarded_tuples)"""
+    return list(iter_mostk_preferred_partition(preference_rules, k,
+                                               tuples_list))
 
-    result = []
-    current_level = 0
-    # Return only k tuples required
-    while len(result) < k and len(result) < len(tuples_list):
-        result += tuples_by_level_dict[current_level]
-        current_level += 1
-    if len(result) > k:
-        result = result[:k]
-    del cpt
-    return result
+
+def iter_mostk_preferred_partition(preference_rules, k, tuples_list):
+    """Generate dominant tuples from 'tuples_list'
+    according to 'preference_rules'
+
+    Same as mostk_preferred_partition, but tuples of a level are
+    generated before next level is computed. Datalog-only theories
+    (comparisons exceeded compilation budget) use datalog method"""
+    # Create a cp-theory to compare tuples
+    cpt = get_theory(preference_rules)
+    if len(tuples_list) == 0:
+        return
+    # Only comparisons over attributes of tuples are generated
+    if len(cpt.comparisons_over(tuples_list[0].keys())) == 0 \
+    and cpt.datalog_only:
+        for tup in iter_mostk_preferred(cpt, k, tuples_list):
+            yield tup
+        return
+    # Partitions with preferred tuples of all comparisons
+    partition_list = []
+    bound = bind_tuple(cpt, tuples_list[0])
+    for bound_comp in bound.comparisons_list:
+        for partition in comparison_partitions(tuples_list, bound_comp):
+            if partition[0] != []:
+                partition_list.append(partition)
+    discarded_list = discarded_tuples(partition_list, k, len(tuples_list))
+    # Number of remaining preferred tuples of each partition
+    num_preferred_list = []
+    # Partitions where each tuple is preferred
+    preferred_lists = [[] for _ in tuples_list]
+    # Number of partitions dominating each tuple
+    num_blocks_list = array('i', [0]) * len(tuples_list)
+    for num_partition, partition in enumerate(partition_list):
+        preferred_list = [index for index in partition[0]
+                          if not discarded_list[index]]
+        num_preferred_list.append(len(preferred_list))
+        for index in preferred_list:
+            preferred_lists[index].append(num_partition)
+        if preferred_list != []:
+            for index in partition[1]:
+                num_blocks_list[index] += 1
+    num_generated = 0
+    # Tuples of level 0
+    level_list = [index for index in range(len(tuples_list))
+                  if not discarded_list[index]
+                  and num_blocks_list[index] == 0]
+    # Process levels until 'k' tuples are ready
+    while num_generated < k and level_list != []:
+        for index in level_list[:k - num_generated]:
+            yield tuples_list[index]
+        num_generated += len(level_list)
+        # Remove tuples of current level from their partitions
+        next_level_list = []
+        for index in level_list:
+            for num_partition in preferred_lists[index]:
+                num_preferred_list[num_partition] -= 1
+                if num_preferred_list[num_partition] > 0:
+                    continue
+                # Partition has no preferred tuples anymore
+                for index_dominated in partition_list[num_partition][1]:
+                    num_blocks_list[index_dominated] -= 1
+                    if num_blocks_list[index_dominated] == 0:
+                        next_level_list.append(index_dominated)
+        level_list = sorted(next_level_list)
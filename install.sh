@@ -32,6 +32,8 @@ echo $DB_NAME
 # Enable preferences
 psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/enable_preferences.sql
 psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/create_preference.sql
+psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/add_preference_rule.sql
+psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/drop_preference_rule.sql
 psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/most_preferred.sql
 psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/most_preferred_optimized.sql
 psql -h $HOSTNAME -d $DB_NAME -U $USER -f sql/most_preferred_partition.sql
@@ -0,0 +1,64 @@
+CREATE OR REPLACE FUNCTION add_preference_rule(preference_name TEXT,
+                                               preference_rules TEXT)
+RETURNS BOOL
+LANGUAGE plpythonu AS $$
+    from sys import path
+    UPREFSQL_PATH = '/usr/lib/postgresql/libuprefsql/uprefsql'
+    UPREFSQL_TABLE = '__preferences'
+    if UPREFSQL_PATH not in path:
+        path.append(UPREFSQL_PATH)
+    from pyparsing import ParseException
+    from cp_theory import CPTheory
+    from cp_budget import BudgetExceeded
+    from cp_session import store_session_theory
+
+    # Check if parameters are valid
+    if preference_name is None or preference_rules is None \
+    or preference_name == '' or preference_rules == '':
+        plpy.notice('Invalid parameters')
+        return False
+
+    # Get stored theory
+    r = plpy.execute('''SELECT * FROM {table}
+                WHERE preference_name = {pref_name}'''.format(
+                    table=UPREFSQL_TABLE,
+                    pref_name=plpy.quote_literal(preference_name)))
+    if len(r) == 0:
+        plpy.notice('Preference not found')
+        return False
+    if r[0]['preference_theory']:
+        cpt = CPTheory.deserialize(r[0]['preference_theory'])
+    else:
+        cpt = CPTheory(r[0]['preference_rules'])
+
+    # Only rules affected by new rules are changed
+    try:
+        consistent = cpt.add_rules(preference_rules)
+    except ParseException as error:
+        plpy.notice('Invalid rules: ' + str(error))
+        return False
+    if consistent:
+        # Comparisons are generated to be stored (see cp_budget)
+        try:
+            theory_string = cpt.serialize()
+        except BudgetExceeded as error:
+            plpy.notice('Preferences are too complex! ' + str(error))
+            return False
+        if cpt.datalog_only:
+            plpy.notice('Queries will use datalog method! ' +
+                        str(cpt.budget_error))
+        plpy.execute('''UPDATE {table}
+                SET preference_rules = {pref_rules},
+                    preference_theory = {pref_theory}
+                WHERE preference_name = {pref_name}'''.format(
+                    table=UPREFSQL_TABLE,
+                    pref_name=plpy.quote_literal(preference_name),
+                    pref_rules=plpy.quote_literal(str(cpt)),
+                    pref_theory=plpy.quote_literal(theory_string)
+                 ))
+        # Keep compiled theory in session cache
+        store_session_theory(GD, preference_name, cpt)
+    else:
+        plpy.notice('Inconsistent preferences! ' + cpt.inconsistency)
+    return consistent
+$$;
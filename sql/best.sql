@@ -7,7 +7,10 @@ LANGUAGE plpythonu AS $$
     UPREFSQL_TABLE = '__preferences'
     if UPREFSQL_PATH not in path:
         path.append(UPREFSQL_PATH)
-    from cp_most_preferred import most_preferred
+    from cp_best import iter_most_preferred_sorted
+    from cp_session import session_theory, cursor_tuples, \
+        CURSOR_BATCH_SIZE
+    from cp_rows import compact_rows, row_dict
 
     # Check if parameters are valid
     if preference_name is None or sql is None \
@@ -15,7 +18,7 @@ LANGUAGE plpythonu AS $$
         plpy.error('Invalid parameters')
 
     # Get preference rules
-    res = plpy.execute('''SELECT preference_rules
+    res = plpy.execute('''SELECT preference_rules, preference_theory
                           FROM {table}
                           WHERE preference_name = {pref_name}'''.format(
                           table=UPREFSQL_TABLE,
@@ -25,8 +28,15 @@ LANGUAGE plpythonu AS $$
         plpy.error('Invalid preference name')
     preference_rules = res[0]['preference_rules']
 
-    # Get tuples from SQL
-    tuples_list = plpy.execute(sql)
+    # Get compiled theory (cached by session or stored in table)
+    cpt = session_theory(GD, preference_name, preference_rules,
+                         res[0]['preference_theory'])
 
-    return most_preferred(preference_rules, tuples_list)
+    # Get tuples from SQL as compact rows
+    tuples_list = compact_rows(cursor_tuples(plpy.cursor(sql),
+                                             CURSOR_BATCH_SIZE))
+
+    # Tuples are returned as soon as they are known to be dominant
+    for tup in iter_most_preferred_sorted(cpt, tuples_list):
+        yield row_dict(tup)
 $$;
@@ -8,6 +8,8 @@ LANGUAGE plpythonu AS $$
     if UPREFSQL_PATH not in path:
         path.append(UPREFSQL_PATH)
     from cp_theory import CPTheory
+    from cp_budget import BudgetExceeded
+    from cp_session import store_session_theory, invalidate_theory
 
     # Check if parameters are valid
     if preference_name is None or preference_rules is None \
@@ -18,6 +20,15 @@ LANGUAGE plpythonu AS $$
     cpt = CPTheory(preference_rules)
     consistent =  cpt.consistent
     if consistent:
+        # Comparisons are generated to be stored (see cp_budget)
+        try:
+            theory_string = cpt.serialize()
+        except BudgetExceeded as error:
+            plpy.notice('Preferences are too complex! ' + str(error))
+            return False
+        if cpt.datalog_only:
+            plpy.notice('Queries will use datalog method! ' +
+                        str(cpt.budget_error))
         # Check if theory already exists
         r = plpy.execute('''SELECT * FROM {table}
                     WHERE preference_name = {pref_name}'''.format(
@@ -25,20 +36,25 @@ LANGUAGE plpythonu AS $$
                         pref_name=plpy.quote_literal(preference_name)))
         # If theory already exists, then delete it
         if len(r) > 0:
+            invalidate_theory(GD, preference_name)
             plpy.execute('''DELETE FROM {table}
                     WHERE preference_name = {pref_name}'''.format(
                         table=UPREFSQL_TABLE,
                         pref_name=plpy.quote_literal(preference_name)
                         ))
         # Store theory
+        # Compiled theory is stored too, so queries do not recompile it
         plpy.execute('''INSERT INTO {table}
-                VALUES ({pref_name}, {pref_rules})'''.format(
+                (preference_name, preference_rules, preference_theory)
+                VALUES ({pref_name}, {pref_rules}, {pref_theory})'''.format(
                     table=UPREFSQL_TABLE,
                     pref_name=plpy.quote_literal(preference_name),
-                    pref_rules=plpy.quote_literal(str(cpt))
+                    pref_rules=plpy.quote_literal(str(cpt)),
+                    pref_theory=plpy.quote_literal(theory_string)
                  ))
+        # Keep compiled theory in session cache
+        store_session_theory(GD, preference_name, cpt)
     else:
-        plpy.notice('Inconsistent preferences!')
-    del cpt
+        plpy.notice('Inconsistent preferences! ' + cpt.inconsistency)
     return consistent
 $$;
@@ -8,6 +8,8 @@ DROP EXTENSION IF EXISTS plpythonu CASCADE;
 CREATE EXTENSION plpythonu;
 
 -- Table to store preferences
+-- Column "preference_theory" keeps the compiled theory
 CREATE TABLE __preferences(
     preference_name TEXT PRIMARY KEY,
-    preference_rules TEXT);
+    preference_rules TEXT,
+    preference_theory TEXT);
@@ -7,8 +7,11 @@ LANGUAGE plpythonu AS $$
     UPREFSQL_TABLE = '__preferences'
     if UPREFSQL_PATH not in path:
         path.append(UPREFSQL_PATH)
-    from cp_most_preferred_partition import most_preferred_partition
-    from cp_mostk_preferred_partition import mostk_preferred_partition
+    from cp_best_partition import iter_most_preferred_partition
+    from cp_topk_partition import iter_mostk_preferred_partition
+    from cp_session import session_theory, cursor_tuples, \
+        CURSOR_BATCH_SIZE
+    from cp_rows import compact_rows, row_dict
 
     # Check if parameters are valid
     if preference_name is None or sql is None \
@@ -16,7 +19,7 @@ LANGUAGE plpythonu AS $$
         plpy.error('Invalid parameters')
 
     # Get preference rules
-    res = plpy.execute('''SELECT preference_rules
+    res = plpy.execute('''SELECT preference_rules, preference_theory
                           FROM {table}
                           WHERE preference_name = {pref_name}'''.format(
                           table=UPREFSQL_TABLE,
@@ -26,11 +29,19 @@ LANGUAGE plpythonu AS $$
         plpy.error('Invalid preference name')
     preference_rules = res[0]['preference_rules']
 
-    # Get tuples from SQL
-    tuples_list = plpy.execute(sql)
+    # Get compiled theory (cached by session or stored in table)
+    cpt = session_theory(GD, preference_name, preference_rules,
+                         res[0]['preference_theory'])
 
+    # Get tuples from SQL as compact rows
+    tuples_list = compact_rows(cursor_tuples(plpy.cursor(sql),
+                                             CURSOR_BATCH_SIZE))
+
+    # Tuples are returned as soon as they are known to be in result
     if k == -1:
-        return most_preferred_partition(preference_rules, tuples_list)
+        result_iter = iter_most_preferred_partition(cpt, tuples_list)
     else:
-        return mostk_preferred_partition(preference_rules, k, tuples_list)
+        result_iter = iter_mostk_preferred_partition(cpt, k, tuples_list)
+    for tup in result_iter:
+        yield row_dict(tup)
 $$;
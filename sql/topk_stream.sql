@@ -0,0 +1,47 @@
+CREATE OR REPLACE FUNCTION mostk_preferred_stream(preference_name TEXT,
+                                                  k INTEGER, sql TEXT,
+                                                  batch_size INTEGER)
+RETURNS SETOF RECORD
+LANGUAGE plpythonu AS $$
+    from sys import path
+    UPREFSQL_PATH = '/usr/lib/postgresql/libuprefsql/uprefsql'
+    UPREFSQL_TABLE = '__preferences'
+    if UPREFSQL_PATH not in path:
+        path.append(UPREFSQL_PATH)
+    from cp_best import iter_most_preferred_stream
+    from cp_topk import iter_mostk_preferred_stream
+    from cp_session import session_theory, cursor_tuples
+    from cp_rows import iter_rows, row_dict
+
+    # Check if parameters are valid
+    if preference_name is None or sql is None \
+    or preference_name == '' or sql == '' \
+    or batch_size is None or batch_size <= 0:
+        plpy.error('Invalid parameters')
+
+    # Get preference rules
+    res = plpy.execute('''SELECT preference_rules, preference_theory
+                          FROM {table}
+                          WHERE preference_name = {pref_name}'''.format(
+                          table=UPREFSQL_TABLE,
+                          pref_name=plpy.quote_literal(preference_name)
+                       ))
+    if len(res) != 1:
+        plpy.error('Invalid preference name')
+    preference_rules = res[0]['preference_rules']
+
+    # Get compiled theory (cached by session or stored in table)
+    cpt = session_theory(GD, preference_name, preference_rules,
+                         res[0]['preference_theory'])
+
+    # Get tuples from SQL in batches of 'batch_size' tuples
+    tuples_iter = iter_rows(cursor_tuples(plpy.cursor(sql), batch_size))
+
+    # Tuples are returned as soon as they are known to be in result
+    if k == -1:
+        result_iter = iter_most_preferred_stream(cpt, tuples_iter)
+    else:
+        result_iter = iter_mostk_preferred_stream(cpt, k, tuples_iter)
+    for tup in result_iter:
+        yield row_dict(tup)
+$$;